@@ -0,0 +1,48 @@
+import re
+import decoder
+
+# applications run by MongoDB itself, their queries are not checked
+mongodb_internal_application = ["MongoDB Automation Agent", "OplogFetcher"]
+
+# drivers and agents usually append their version to the name, like "MongoDB Automation Agent v13.10.0 (git: ...)"
+version_suffix = re.compile(r" v\d.*$")
+
+class ApplicationFilter:
+    # decides whether the queries sent by an application (attr.appName) are checked, None being a query without appName
+    def __init__(self, include=None, exclude=mongodb_internal_application):
+        self.include = frozenset(include) if include else None
+        self.exclude = frozenset(exclude)
+
+    def accepts(self, app_name):
+        # a name matches the appName as logged or without its version, so "etl v1" and "etl" both match "etl v1"
+        name = app_name
+        if app_name is not None and " v" in app_name:
+            name = version_suffix.sub("", app_name)
+        if app_name in self.exclude or name in self.exclude:
+            return False
+        return self.include is None or app_name in self.include or name in self.include
+
+    def accepts_line(self, line):
+        return self.accepts(line_app_name(line))
+
+default_filter = ApplicationFilter()
+
+app_name_key = b'"appName":"'
+command_key = b'"command":'
+
+def line_app_name(line):
+    # 4.4 logs attr.appName before attr.command, so it can be read from the raw line without decoding it
+    key = line.find(app_name_key)
+    if key == -1:
+        return None
+    command = line.find(command_key)
+    if command == -1 or key < command:
+        start = key + len(app_name_key)
+        end = line.find(b'"', start)
+        value = line[start:end]
+        if b"\\" not in value:
+            return value.decode('utf-8', errors='replace')
+
+    # the appName found belongs to the command or is escaped, read the actual field with the selected backend
+    attr = decoder.loads(line).get("attr") or {}
+    return attr.get("appName")
@@ -0,0 +1,217 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import types
+import check_50
+import check_60
+import check_80
+import decoder
+import engine
+import loggen
+import rules
+from reader import iter_file_lines, iter_log_files, iter_query_lines
+
+checkers = {
+    "check_50": check_50.check,
+    "check_60": check_60.check,
+    "check_80": check_80.check,
+}
+
+# check_50 as it was before the rules registry, read from the baseline commit as the reference the current checks
+# are compared to and timed against: every entry is decoded once per allowlisted command, and the parameters of
+# every command whose name is a key of the command are popped until an invalid one raises.
+baseline_commit = "99f787374212eb07e07196f149e7052840e50e03"
+
+def load_legacy_check_50():
+    repository = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(["git", "show", f"{baseline_commit}:check_50.py"], cwd=repository, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"Cannot read the baseline check_50 from commit {baseline_commit}: {result.stderr.strip()}")
+    module = types.ModuleType("legacy_check_50")
+    exec(compile(result.stdout, f"{baseline_commit[:7]}:check_50.py", "exec"), module.__dict__)
+    return module.check
+
+# the baseline misses these two removed commands, its list joins "reseterror" and "geoSearch" into one name
+legacy_missed_commands = frozenset(["reseterror", "geoSearch"])
+
+def current_messages(entries):
+    # the messages of the 5.0 findings of every entry, before they are aggregated by shape
+    messages = set()
+    for entry in entries:
+        jentry = decoder.decode(entry)
+        command = rules.entry_command(jentry)
+        if command is not None and rules.command_name(command) in legacy_missed_commands:
+            continue
+        for finding in check_50.check_entry(jentry, entry):
+            messages.add(finding.message)
+    return messages
+
+def timed(check, entries, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = check(entries)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return results, best
+
+def bench_check_50(entries, repeat):
+    legacy_results, legacy_time = timed(load_legacy_check_50(), entries, repeat)
+    results, elapsed = timed(check_50.check, entries, repeat)
+    messages = current_messages(entries)
+    if messages != legacy_results["errors"]:
+        missing = sorted(legacy_results["errors"] - messages)[:3]
+        extra = sorted(messages - legacy_results["errors"])[:3]
+        raise Exception(f"check_50 findings differ from the baseline implementation, missing {missing}, extra {extra}")
+
+    print(f"check_50: {len(entries)} lines, {len(messages)} distinct messages (identical to the baseline), {len(results['findings'])} findings")
+    print(f"   baseline {legacy_time:.3f}s  {len(entries) / legacy_time:,.0f} lines/sec")
+    print(f"   current  {elapsed:.3f}s  {len(entries) / elapsed:,.0f} lines/sec")
+    print(f"   speedup {legacy_time / elapsed:.1f}x")
+
+def bench_backends(entries, repeat):
+    # decoding alone and the whole engine, for every JSON backend installed
+    print(f"JSON backends: {len(entries)} lines")
+    for name in decoder.available_backends():
+        decoder.use_backend(name)
+        _, decode_time = timed(lambda entries: [decoder.decode(entry) for entry in entries], entries, repeat)
+        _, check_time = timed(engine.check, entries, repeat)
+        print(f"   {name:<9} decode {len(entries) / decode_time:,.0f} lines/sec   check {len(entries) / check_time:,.0f} lines/sec")
+    decoder.use_backend()
+
+def count_log(log_path):
+    lines = 0
+    size = 0
+    for file_path in iter_log_files(log_path):
+        for line in iter_file_lines(file_path):
+            lines += 1
+            size += len(line)
+    return lines, size
+
+def run_stage(stage, log_path, json_backend, repeat):
+    # runs in its own process so the peak RSS belongs to the stage alone
+    decoder.use_backend(json_backend)
+    if stage == "read":
+        _, elapsed = timed(lambda log_path: sum(1 for _ in iter_query_lines(log_path)), log_path, repeat)
+    elif stage == "scan":
+        _, elapsed = timed(lambda log_path: engine.check(iter_query_lines(log_path)), log_path, repeat)
+    else:
+        entries = list(iter_query_lines(log_path))
+        if stage == "decode":
+            _, elapsed = timed(lambda entries: [decoder.decode(entry) for entry in entries], entries, repeat)
+        elif stage == "engine":
+            _, elapsed = timed(engine.check, entries, repeat)
+        else:
+            _, elapsed = timed(checkers[stage], entries, repeat)
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def bench_stages(log_path, json_backend, repeat):
+    # read and scan go through every line of the logs, the other stages only through the slow queries
+    log_lines, log_size = count_log(log_path)
+    query_lines = 0
+    query_size = 0
+    for entry in iter_query_lines(log_path):
+        query_lines += 1
+        query_size += len(entry.encode())
+
+    stages = ["read", "decode"] + list(checkers) + ["engine", "scan"]
+    results = []
+    print(f"Stages: {log_lines} lines ({log_size / 1024 / 1024:.1f} MB), {query_lines} slow queries ({query_size / 1024 / 1024:.1f} MB), {json_backend} JSON backend")
+    context = multiprocessing.get_context("spawn")
+    for stage in stages:
+        with context.Pool(1) as pool:
+            elapsed, peak_rss = pool.apply(run_stage, (stage, log_path, json_backend, repeat))
+        lines, size = (log_lines, log_size) if stage in ("read", "scan") else (query_lines, query_size)
+        result = {
+            "stage": stage,
+            "lines": lines,
+            "bytes": size,
+            "seconds": elapsed,
+            "lines_per_sec": lines / elapsed,
+            "mb_per_sec": size / 1024 / 1024 / elapsed,
+            "peak_rss_mb": peak_rss / 1024 / 1024,
+        }
+        results.append(result)
+        print(f"   {stage:<9} {result['lines_per_sec']:>12,.0f} lines/sec {result['mb_per_sec']:>9,.1f} MB/sec {result['peak_rss_mb']:>8,.1f} MB peak RSS")
+    return results
+
+def save_results(file_path, args, results):
+    generator = None
+    if args.log_path is None:
+        generator = {
+            "lines": args.lines,
+            "seed": args.seed,
+            "slow_ratio": args.slow_ratio,
+            "internal_ratio": args.internal_ratio,
+            "mix": args.mix,
+            "mean_size": args.mean_size,
+        }
+    document = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "json_backend": decoder.backend,
+        "repeat": args.repeat,
+        "log_path": args.log_path,
+        "generator": generator,
+        "stages": results,
+    }
+    with open(file_path, 'w') as f:
+        json.dump(document, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compatibility checks against a set of logs.")
+    parser.add_argument(
+        '--log-path',
+        type=str,
+        help="Path to the directory where the logs are located. Without it a synthetic log is generated with the options below."
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help="Number of runs per implementation, the best one is reported."
+    )
+    parser.add_argument(
+        '--json-backend',
+        choices=["auto"] + list(decoder.backends),
+        default="auto",
+        help="JSON library used by the stages."
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        help="JSON file the results of the stages are written to, to compare releases."
+    )
+    loggen.add_arguments(parser)
+    args = parser.parse_args()
+    if args.repeat < 1 or args.lines < 1:
+        parser.error("--repeat and --lines must be positive")
+    try:
+        decoder.use_backend(args.json_backend)
+    except Exception as e:
+        parser.error(str(e))
+
+    with tempfile.TemporaryDirectory() as directory:
+        log_path = args.log_path
+        if log_path is None:
+            log_path = directory
+            loggen.write_log(os.path.join(directory, "mongod.log"), args)
+
+        results = bench_stages(log_path, decoder.backend, args.repeat)
+        if args.output:
+            save_results(args.output, args, results)
+
+        # the comparisons below measure the checks, so the lines are loaded up front
+        entries = list(iter_query_lines(log_path))
+        bench_check_50(entries, args.repeat)
+        bench_backends(entries, args.repeat)
+
+if __name__ == "__main__":
+    main()
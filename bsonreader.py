@@ -0,0 +1,276 @@
+import base64
+import datetime
+import decimal
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import uuid
+from applications import default_filter
+from decoder import freeze_dict
+
+# Reader of the system.profile collections archived with mongodump. A .bson file is a sequence of documents,
+# each one starting with its length, so the documents are read one at a time: from the mapped file when it is
+# uncompressed, without copying it, or from the decompressed stream. Values are decoded to the extended JSON
+# the 4.4 logs use, and every profile document is turned into the slow query entry mongod would have logged,
+# so all the checks, shapes and reports apply to it unchanged. The entries are handed to the checks already
+# decoded instead of being serialized and parsed again.
+
+profile_dump = re.compile(r"\.bson(\.(gz|bz2|xz|zst))?$")
+
+int32 = struct.Struct("<i")
+uint32 = struct.Struct("<I")
+int64 = struct.Struct("<q")
+double = struct.Struct("<d")
+two_uint64 = struct.Struct("<QQ")
+
+def is_profile_dump(file_path):
+    return profile_dump.search(file_path) is not None
+
+def read_cstring(data, position):
+    end = data.find(b"\x00", position)
+    return data[position:end].decode('utf-8', errors='replace'), end + 1
+
+def read_string(data, position):
+    (length,) = int32.unpack_from(data, position)
+    start = position + 4
+    return data[start:start + length - 1].decode('utf-8', errors='replace'), start + length
+
+def format_date(milliseconds):
+    try:
+        date = datetime.datetime.fromtimestamp(milliseconds / 1000, datetime.timezone.utc)
+    except (OverflowError, ValueError, OSError):
+        return { "$date": { "$numberLong": str(milliseconds) } }
+    return { "$date": date.isoformat(timespec="milliseconds") }
+
+def format_decimal128(data, position):
+    low, high = two_uint64.unpack_from(data, position)
+    sign = "-" if high >> 63 else ""
+    if (high >> 61) & 3 == 3:
+        special = (high >> 58) & 0x1f
+        if special == 0x1e:
+            return sign + "Infinity"
+        if special == 0x1f:
+            return "NaN"
+        # a coefficient out of range is zero
+        exponent = ((high >> 47) & 0x3fff) - 6176
+        coefficient = 0
+    else:
+        exponent = ((high >> 49) & 0x3fff) - 6176
+        coefficient = ((high & 0x1ffffffffffff) << 64) | low
+    return str(decimal.Decimal(f"{sign}{coefficient}E{exponent}"))
+
+def decode_value(data, position, kind):
+    # returns the value starting at position and the position after it
+    if kind == 0x01:
+        (value,) = double.unpack_from(data, position)
+        if not math.isfinite(value):
+            # NaN and Infinity are not valid JSON
+            value = { "$numberDouble": str(value).replace("inf", "Infinity").replace("nan", "NaN") }
+        return value, position + 8
+    if kind == 0x02:
+        return read_string(data, position)
+    if kind == 0x03:
+        return decode_document(data, position)
+    if kind == 0x04:
+        return decode_document(data, position, as_list=True)
+    if kind == 0x05:
+        (length,) = int32.unpack_from(data, position)
+        subtype = data[position + 4]
+        value = bytes(data[position + 5:position + 5 + length])
+        if subtype == 4 and length == 16:
+            return { "$uuid": str(uuid.UUID(bytes=value)) }, position + 5 + length
+        return { "$binary": { "base64": base64.b64encode(value).decode(), "subType": f"{subtype:02x}" } }, position + 5 + length
+    if kind == 0x06:
+        return { "$undefined": True }, position
+    if kind == 0x07:
+        return { "$oid": data[position:position + 12].hex() }, position + 12
+    if kind == 0x08:
+        return data[position] != 0, position + 1
+    if kind == 0x09:
+        (milliseconds,) = int64.unpack_from(data, position)
+        return format_date(milliseconds), position + 8
+    if kind == 0x0A:
+        return None, position
+    if kind == 0x0B:
+        pattern, position = read_cstring(data, position)
+        options, position = read_cstring(data, position)
+        return { "$regularExpression": { "pattern": pattern, "options": options } }, position
+    if kind == 0x0C:
+        namespace, position = read_string(data, position)
+        return { "$dbPointer": { "$ref": namespace, "$id": { "$oid": data[position:position + 12].hex() } } }, position + 12
+    if kind == 0x0D:
+        code, position = read_string(data, position)
+        return { "$code": code }, position
+    if kind == 0x0E:
+        symbol, position = read_string(data, position)
+        return { "$symbol": symbol }, position
+    if kind == 0x0F:
+        code, scope_position = read_string(data, position + 4)
+        scope, _ = decode_document(data, scope_position)
+        (length,) = int32.unpack_from(data, position)
+        return { "$code": code, "$scope": scope }, position + length
+    if kind == 0x10:
+        (value,) = int32.unpack_from(data, position)
+        return value, position + 4
+    if kind == 0x11:
+        increment, timestamp = uint32.unpack_from(data, position)[0], uint32.unpack_from(data, position + 4)[0]
+        return { "$timestamp": { "t": timestamp, "i": increment } }, position + 8
+    if kind == 0x12:
+        (value,) = int64.unpack_from(data, position)
+        return value, position + 8
+    if kind == 0x13:
+        return { "$numberDecimal": format_decimal128(data, position) }, position + 16
+    if kind == 0xFF:
+        return { "$minKey": 1 }, position
+    if kind == 0x7F:
+        return { "$maxKey": 1 }, position
+    raise Exception(f"Unsupported BSON type {kind:#x} at offset {position}")
+
+def decode_document(data, position, as_list=False):
+    # returns the document starting at position, as a list for arrays, and the position after it
+    (length,) = int32.unpack_from(data, position)
+    end = position + length - 1
+    position += 4
+    values = [] if as_list else {}
+    while position < end:
+        kind = data[position]
+        name, position = read_cstring(data, position + 1)
+        value, position = decode_value(data, position, kind)
+        if as_list:
+            values.append(value)
+        else:
+            values[name] = value
+    return values, end + 1
+
+def iter_documents(f, mapped=True):
+    # f is the opened dump, mapped when it is an uncompressed file
+    if not mapped:
+        while True:
+            head = f.read(4)
+            if len(head) < 4:
+                return
+            (length,) = int32.unpack(head)
+            if length < 5:
+                raise Exception(f"{f.name} has an invalid document length {length}")
+            data = head + f.read(length - 4)
+            if len(data) < length:
+                raise Exception(f"{f.name} ends with a truncated document")
+            yield decode_document(data, 0)[0]
+
+    size = os.fstat(f.fileno()).st_size
+    if size == 0:
+        return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position = 0
+        while position + 4 <= size:
+            (length,) = int32.unpack_from(mm, position)
+            if length < 5 or position + length > size:
+                raise Exception(f"{f.name} has a truncated or invalid document at offset {position}")
+            yield decode_document(mm, position)[0]
+            position += length
+
+# the profiler logs a statement of an update or a delete, the rules look at the whole command
+write_operations = {
+    "update": ("update", "updates"),
+    "remove": ("delete", "deletes"),
+}
+
+# fields of the profile document copied to attr, under the name mongod logs them with
+profile_attributes = [
+    ("planSummary", "planSummary"),
+    ("keysExamined", "keysExamined"),
+    ("docsExamined", "docsExamined"),
+    ("numYield", "numYields"),
+    ("nreturned", "nreturned"),
+    ("responseLength", "reslen"),
+    ("protocol", "protocol"),
+    ("millis", "durationMillis"),
+]
+
+def profile_entry(document):
+    # the slow query log entry of a profile document
+    ns = document.get("ns")
+    command = document.get("command")
+    if not isinstance(command, dict):
+        command = {}
+    operation = write_operations.get(document.get("op"))
+    if operation is not None and operation[0] not in command:
+        command = { operation[0]: ns.split(".", 1)[-1] if isinstance(ns, str) else None, operation[1]: [command] }
+    attr = {
+        "type": "command",
+        "ns": ns,
+    }
+    if "appName" in document:
+        attr["appName"] = document["appName"]
+    attr["command"] = command
+    if "originatingCommand" in document:
+        attr["originatingCommand"] = document["originatingCommand"]
+    for field, name in profile_attributes:
+        if field in document:
+            attr[name] = document[field]
+    return {
+        "t": document.get("ts"),
+        "s": "I",
+        "c": "COMMAND",
+        "id": 51803,
+        "ctx": "profile",
+        "msg": "Slow query",
+        "attr": attr,
+    }
+
+def contains_text(value, text):
+    # whether a key or a string of value holds text. For a text without quotes, backslashes or control characters
+    # this is whether its JSON serialization holds it.
+    if isinstance(value, str):
+        return text in value
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if text in k or contains_text(v, text):
+                return True
+    elif isinstance(value, list):
+        for v in value:
+            if contains_text(v, text):
+                return True
+    return False
+
+class ProfileEntry:
+    # a decoded entry, decode returns it as is. The rules looking for a text in the raw line, like the removed
+    # opcodes, search the keys and strings of the entry instead. It is only serialized when printed.
+    __slots__ = ("jentry", "line")
+
+    def __init__(self, entry):
+        self.jentry = freeze_dict(entry)
+        self.line = None
+
+    def __str__(self):
+        if self.line is None:
+            self.line = json.dumps(self.jentry, separators=(",", ":"))
+        return self.line
+
+    def __contains__(self, text):
+        return contains_text(self.jentry, text)
+
+def iter_profile_query_lines(f, mapped=True, app_filter=default_filter, stats=None, window=None):
+    # the profile documents as slow query entries, the ones outside the (since, until) window are skipped.
+    # The profiler inserts the documents in time order, so reading stops after the window.
+    since, until = window if window is not None else (None, None)
+    for document in iter_documents(f, mapped):
+        if stats is not None:
+            stats.lines["read"] += 1
+        if not app_filter.accepts(document.get("appName")):
+            if stats is not None:
+                stats.lines["excluded"] += 1
+            continue
+        entry = profile_entry(document)
+        if since is not None or until is not None:
+            t = entry["t"]
+            timestamp = datetime.datetime.fromisoformat(t["$date"]) if isinstance(t, dict) and isinstance(t.get("$date"), str) else None
+            if timestamp is not None:
+                if until is not None and timestamp > until:
+                    return
+                if since is not None and timestamp < since:
+                    continue
+        yield ProfileEntry(entry)
@@ -0,0 +1,93 @@
+import hashlib
+import inspect
+import json
+import sqlite3
+import rules
+import shapes
+
+# Verdicts of the command rules of every version, keyed by the verdict shape of the command and stored in a SQLite file so they are
+# reused across runs and hosts. The file is emptied when the rules change, and the least recently used verdicts
+# are evicted when it holds more than max_entries of them.
+
+def ruleset_version():
+    # changes whenever the code of a registered rule, of the registry or of the shapes changes, or other rules are selected
+    files = { inspect.getsourcefile(inspect.unwrap(check)) for check in rules.registered_rules() }
+    files.update([inspect.getsourcefile(rules), inspect.getsourcefile(shapes)])
+    digest = hashlib.sha1()
+    for file_path in sorted(files):
+        with open(file_path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(json.dumps(rules.selection).encode())
+    return digest.hexdigest()
+
+def shape_key(verdict_shape):
+    return hashlib.sha1(verdict_shape.encode()).hexdigest()
+
+class VerdictCache:
+    def __init__(self, path, max_entries=100000, flush_every=1000):
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        # verdicts read or computed by this process, new ones are written on flush
+        self.memory = {}
+        self.pending = {}
+        self.used = set()
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            version = ruleset_version()
+            row = self.connection.execute("SELECT value FROM meta WHERE name = 'ruleset'").fetchone()
+            if row is None or row[0] != version:
+                # the table is created again as its layout may have changed with the code
+                self.connection.execute("DROP TABLE IF EXISTS verdicts")
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('ruleset', ?)", (version,))
+            self.connection.execute("CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, shape TEXT, verdicts TEXT, last_used INTEGER)")
+
+    def get(self, verdict_shape):
+        key = shape_key(verdict_shape)
+        verdicts = self.memory.get(key)
+        if verdicts is None:
+            row = self.connection.execute("SELECT shape, verdicts FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            shape, stored = row
+            verdicts = [[rules.Finding.from_list(values, shape) for values in verdict] for verdict in json.loads(stored)]
+            self.remember(key, verdicts)
+        self.used.add(key)
+        return verdicts
+
+    def put(self, verdict_shape, shape, verdicts):
+        # verdicts holds the findings of the command rules of every version, they are aggregated by the query shape
+        for verdict in verdicts:
+            for finding in verdict:
+                finding.shape = shape
+        key = shape_key(verdict_shape)
+        self.remember(key, verdicts)
+        self.pending[key] = (shape, verdicts)
+        self.used.add(key)
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def remember(self, key, verdicts):
+        if len(self.memory) >= self.max_entries:
+            self.memory.clear()
+        self.memory[key] = verdicts
+
+    def flush(self):
+        with self.connection:
+            clock = self.connection.execute("SELECT COALESCE(MAX(last_used), 0) + 1 FROM verdicts").fetchone()[0]
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)",
+                [(key, shape, json.dumps([[finding.to_list() for finding in verdict] for verdict in verdicts]), clock) for key, (shape, verdicts) in self.pending.items()])
+            self.connection.executemany(
+                "UPDATE verdicts SET last_used = ? WHERE key = ?",
+                [(clock, key) for key in self.used if key not in self.pending])
+            self.connection.execute(
+                "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,))
+        self.pending = {}
+        self.used = set()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
@@ -1,36 +1,63 @@
-import json
-
-def check_find_parameters(entry):
-    flat = json.dumps(entry)
-
-    unsupported_query_operators = [
-        "$explain", 
-        "$comment",
-        "$hint",
-        "$max",
-        "$maxTimeMS",
-        "$min",
-        "$orderby",
-        "$query",
-        "$returnKey",
-        "$showDiskLoc"
-    ]
+from decoder import decode
+from findings import add_finding
+from rules import Finding, command_name, entry_rule, iter_keys, rule, run_rules
+
+unsupported_query_operators = frozenset([
+    "$explain",
+    "$comment",
+    "$hint",
+    "$max",
+    "$maxTimeMS",
+    "$min",
+    "$orderby",
+    "$query",
+    "$returnKey",
+    "$showDiskLoc"
+])
+
+# every operator a find command is checked for, a single walk over the command finds all of them
+find_operators = unsupported_query_operators | {"$mod"}
+mod_operators = frozenset(["$mod"])
+
+# parameters holding a query, and the parameters holding statements whose q is one
+query_parameters = frozenset(["filter", "query", "pipeline"])
+statement_parameters = frozenset(["updates", "deletes"])
+
+def query_keys(command, keys):
+    # iter_keys over the queries of the command only, in document order. The other parameters, like lsid,
+    # writeConcern or the documents and updates of a write, hold no query.
+    for k, v in command.items():
+        if k in keys:
+            yield k, k
+        if k in query_parameters:
+            yield from iter_keys(v, keys, k)
+        elif k in statement_parameters and isinstance(v, list):
+            for i, statement in enumerate(v):
+                if isinstance(statement, dict) and "q" in statement:
+                    yield from iter_keys(statement["q"], keys, f"{k}.{i}.q")
 
-    for operator in unsupported_query_operators:
-        if operator in flat:
-            raise Exception(f"{operator} is not supported in version 5.1+ when using find")
-    
-def check_command(command, entry):
-    if "find" in command:
-        check_find_parameters(entry)
-
-    if "reIndex" in command:
-        raise Exception("reIndex is not supported in version 6.0+")
-    
-    if "$mod" in json.dumps(entry):
-        raise Exception("$mod has changed in version 6.0+, review the documentation https://www.mongodb.com/docs/manual/release-notes/6.0-compatibility/#-mod-error-behavior")
-
-def check_op_codes_removed(entry):
+@rule("6.0", "reIndex")
+def check_reIndex(command, jentry):
+    return Finding("reIndex is not supported in version 6.0+", location="reIndex")
+
+@rule("6.0")
+def check_query_operators(command, jentry):
+    # every operator is reported once, at its first location, and the walk stops once all of them are
+    operators = find_operators if command_name(command) == "find" else mod_operators
+    reported = set()
+    for location, operator in query_keys(command, operators):
+        if operator in reported:
+            continue
+        reported.add(operator)
+        if operator in unsupported_query_operators:
+            yield Finding(f"{operator} is not supported in version 5.1+ when using find", location=location)
+        else:
+            yield Finding("$mod has changed in version 6.0+, review the documentation https://www.mongodb.com/docs/manual/release-notes/6.0-compatibility/#-mod-error-behavior", "warning", location)
+        if len(reported) == len(operators):
+            return
+
+@entry_rule("6.0")
+def check_op_codes_removed(jentry, entry):
     unsupported_op_codes = [
         "OP_INSERT",
         "OP_DELETE",
@@ -39,20 +66,21 @@ def check_op_codes_removed(entry):
         "OP_GET_MORE",
         "OP_QUERY"
     ]
+    # a single search rules out most entries
+    if "OP_" not in entry:
+        return
     for op_code in unsupported_op_codes:
         if op_code in entry:
-            raise Exception(f"{op_code} is not supported in version 5.1+")
+            yield Finding(f"{op_code} is not supported in version 5.1+")
+
+def check_entry(jentry, entry):
+    return run_rules("6.0", jentry, entry)
 
 def check(entries):
-    errors = []
+    findings = {}
     for entry in entries:
-        jentry = json.loads(entry)
-        try:
-            if jentry["c"] == "COMMAND" and "command" in jentry["attr"]:
-                command = jentry["attr"]["command"]
-                check_command(command, jentry)
-            check_op_codes_removed(entry)
-        except Exception as e:
-            errors.append(str(e))
-
-    return { "errors": errors }
\ No newline at end of file
+        jentry = decode(entry)
+        for finding in check_entry(jentry, entry):
+            add_finding(findings, finding, jentry)
+
+    return { "findings": findings }
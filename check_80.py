@@ -1,26 +1,91 @@
 import json
+from decoder import decode
+from findings import add_finding
+from rules import Finding, rule, run_rules
 
-def check_find_parameters(command):
-    if "filter" in command:
-        filter = command["filter"]
-        flat = json.dumps(filter)
-        if "null" in flat or "undefined" in flat:
-            raise Exception(f"Warn: Starting in MongoDB 8.0, comparisons to null in equality match expressions don't match undefined values. Review the documentation https://www.mongodb.com/docs/manual/release-notes/8.0-compatibility/#queries-for-null-don-t-match-undefined-fields to check if you are affected by this change. The following query might be affected by this {flat}")
+null_message = "Warn: Starting in MongoDB 8.0, comparisons to null in equality match expressions don't match undefined values. Review the documentation https://www.mongodb.com/docs/manual/release-notes/8.0-compatibility/#queries-for-null-don-t-match-undefined-fields to check if you are affected by this change. The following query might be affected by this {}"
 
-def check_command(command, jentry):
-    if "find" in command:
-        check_find_parameters(command)
+logical_operators = frozenset(["$and", "$or", "$nor"])
+# operators comparing a field to a value, or to each value of a list
+equality_operators = frozenset(["$eq", "$ne"])
+list_equality_operators = frozenset(["$in", "$nin"])
 
+def is_null(value):
+    # undefined is logged as {"$undefined": true}
+    return value is None or (isinstance(value, dict) and "$undefined" in value)
+
+def is_operator_document(value):
+    for k in value:
+        return k.startswith("$")
+    return False
+
+def matches_null(condition):
+    # condition is what a field is compared to: a value or a document of operators
+    if is_null(condition):
+        return True
+    if not isinstance(condition, dict) or not is_operator_document(condition):
+        return False
+    for operator, value in condition.items():
+        if operator in equality_operators and is_null(value):
+            return True
+        if operator in list_equality_operators and isinstance(value, list) and any(is_null(v) for v in value):
+            return True
+        if operator == "$not" and isinstance(value, dict) and matches_null(value):
+            return True
+        if operator == "$elemMatch" and isinstance(value, dict) and (matches_null(value) or has_null_equality(value)):
+            return True
+    return False
+
+def has_null_equality(filter):
+    # walks the predicates of a query filter and stops at the first equality to null or undefined
+    for key, value in filter.items():
+        if key in logical_operators:
+            if isinstance(value, list) and any(isinstance(v, dict) and has_null_equality(v) for v in value):
+                return True
+        elif not key.startswith("$") and matches_null(value):
+            return True
+    return False
+
+def check_filter(filter, location):
+    if isinstance(filter, dict) and has_null_equality(filter):
+        return Finding(null_message.format(json.dumps(filter)), "warning", location)
+    return None
+
+@rule("8.0", "find")
+def check_find_parameters(command, jentry):
+    return check_filter(command.get("filter"), "filter")
+
+@rule("8.0", "aggregate")
+def check_aggregate_parameters(command, jentry):
+    # every $match stage comparing to null is reported
+    pipeline = command.get("pipeline")
+    if isinstance(pipeline, list):
+        for i, stage in enumerate(pipeline):
+            if isinstance(stage, dict) and "$match" in stage:
+                finding = check_filter(stage["$match"], f"pipeline.{i}.$match")
+                if finding:
+                    yield finding
+
+@rule("8.0", "update", "delete")
+def check_write_parameters(command, jentry):
+    # every statement comparing to null is reported
+    field = "updates" if "update" in command else "deletes"
+    statements = command.get(field)
+    if isinstance(statements, list):
+        for i, statement in enumerate(statements):
+            if isinstance(statement, dict):
+                finding = check_filter(statement.get("q"), f"{field}.{i}.q")
+                if finding:
+                    yield finding
+
+def check_entry(jentry, entry):
+    return run_rules("8.0", jentry, entry)
 
 def check(entries):
-    errors = set()
+    findings = {}
     for entry in entries:
-        jentry = json.loads(entry)
-        if jentry["c"] == "COMMAND" and "command" in jentry["attr"]:
-            command = jentry["attr"]["command"]
-            try:
-                check_command(command, jentry)
-            except Exception as e:
-                errors.add(str(e))
-
-    return { "errors": errors }    
\ No newline at end of file
+        jentry = decode(entry)
+        for finding in check_entry(jentry, entry):
+            add_finding(findings, finding, jentry)
+
+    return { "findings": findings }
@@ -0,0 +1,176 @@
+import itertools
+import json
+import operator
+from rules import payload_parameters
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+# A log entry is decoded once and the same object is handed to every version
+# checker, so the mappings and the lists it contains are read-only.
+def readonly(self, *args, **kwargs):
+    raise TypeError("log entries are shared between checkers and cannot be modified")
+
+class FrozenDict(dict):
+    __setitem__ = readonly
+    __delitem__ = readonly
+    __ior__ = readonly
+    pop = readonly
+    popitem = readonly
+    clear = readonly
+    update = readonly
+    setdefault = readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+class FrozenList(list):
+    __setitem__ = readonly
+    __delitem__ = readonly
+    __iadd__ = readonly
+    __imul__ = readonly
+    append = readonly
+    extend = readonly
+    insert = readonly
+    pop = readonly
+    remove = readonly
+    clear = readonly
+    sort = readonly
+    reverse = readonly
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+# the parsers cannot build frozen containers, the containers of the tree they return are replaced in place by
+# frozen copies, from the leaves up
+def freeze_dict(value):
+    for key, item in value.items():
+        kind = type(item)
+        if kind is dict:
+            value[key] = freeze_dict(item)
+        elif kind is list:
+            value[key] = freeze_list(item)
+    return FrozenDict(value)
+
+def freeze_list(value):
+    for i, item in enumerate(value):
+        kind = type(item)
+        if kind is dict:
+            value[i] = freeze_dict(item)
+        elif kind is list:
+            value[i] = freeze_list(item)
+    return FrozenList(value)
+
+def json_loads(entry):
+    return freeze_dict(json.loads(entry))
+
+def orjson_loads(entry):
+    return freeze_dict(orjson.loads(entry))
+
+def simdjson_loads(entry):
+    return freeze_dict(simdjson.loads(entry))
+
+# backends in order of preference, the first one installed is used by default
+backends = {
+    "orjson": (orjson, orjson_loads),
+    "simdjson": (simdjson, simdjson_loads),
+    "json": (json, json_loads),
+}
+
+def available_backends():
+    return [name for name, (module, _) in backends.items() if module is not None]
+
+def use_backend(name="auto"):
+    global backend, loads
+    if name == "auto":
+        name = available_backends()[0]
+    if name not in backends:
+        raise Exception(f"Unknown JSON backend {name}, the supported ones are {', '.join(backends)}")
+    module, backend_loads = backends[name]
+    if module is None:
+        raise Exception(f"The {name} package is not installed")
+    backend = name
+    loads = backend_loads
+
+# Inserts can log megabytes of documents that no rule looks into. On long lines the payload parameters are cut out
+# of the raw line and replaced by {"$skipped": <bytes>} before parsing, so they are neither parsed nor allocated.
+# The end of a payload is found with byte operations only: escaped characters are dropped, everything but quotes
+# and brackets is deleted and the empty strings left are removed. This only pays off on payloads of many small
+# values, at least a quote every dense_size bytes: the parsers copy long strings faster than they can be scanned.
+# When a quote remains, a string holds a bracket and the brackets cannot be matched without parsing, so the line
+# is decoded whole, as it is when the cut value turns out not to be a parameter of attr.command.
+lazy_size = 64 * 1024
+dense_size = 16
+sample_size = 4096
+skipped_marker = b'{"$skipped":'
+structure = bytes(c for c in range(256) if c not in b'"[]{}')
+depths = [0] * 256
+for c in b"[{":
+    depths[c] = 1
+for c in b"]}":
+    depths[c] = -1
+
+def payload_end(data, start):
+    # the offset after the array or object starting at start, None when it cannot be found without parsing
+    # long strings are copied by the parser faster than they are scanned here, the start of the payload tells
+    if data.count(b'"', start, start + sample_size) * dense_size < min(sample_size, len(data) - start):
+        return None
+    rest = data[start:]
+    if b"\\" in rest:
+        rest = rest.replace(b"\\\\", b"").replace(b'\\"', b"")
+    brackets = rest.translate(None, structure).replace(b'""', b"")
+    if b'"' in brackets:
+        return None
+    try:
+        last = operator.indexOf(itertools.accumulate(map(depths.__getitem__, brackets)), 0)
+    except ValueError:
+        return None
+    # the closing bracket is found from the end of the line, only a few brackets follow it
+    end = len(data)
+    for _ in range(len(brackets) - last):
+        end = max(data.rfind(b, start, end) for b in (b"[", b"]", b"{", b"}"))
+    return end + 1
+
+def skip_payloads(entry):
+    # the line with its payload parameters cut and the names of the ones cut, None when nothing was cut
+    data = entry.encode()
+    skipped = []
+    for name in payload_parameters:
+        key = f'"{name}":['.encode()
+        start = data.find(key)
+        if start == -1:
+            continue
+        start += len(key) - 1
+        end = payload_end(data, start)
+        if end is not None:
+            data = data[:start] + skipped_marker + str(end - start).encode() + b"}" + data[end:]
+            skipped.append(name)
+    # a line logging a skipped marker of its own is decoded whole
+    if not skipped or data.count(skipped_marker) != len(skipped):
+        return None
+    return data, skipped
+
+def decode(entry):
+    if not isinstance(entry, str):
+        # the entries of profile dumps are decoded as they are read
+        return entry.jentry
+    if len(entry) < lazy_size:
+        return loads(entry)
+    lazy = skip_payloads(entry)
+    if lazy is not None:
+        data, skipped = lazy
+        jentry = loads(data)
+        attr = jentry.get("attr")
+        command = attr.get("command") if isinstance(attr, dict) else None
+        if isinstance(command, dict) and all(isinstance(command.get(name), dict) and "$skipped" in command[name] for name in skipped):
+            return jentry
+    return loads(entry)
+
+use_backend()
@@ -0,0 +1,73 @@
+import time
+from decoder import decode
+from findings import add_finding
+from rules import entry_command, run_command_rules, run_entry_rules, run_rules
+from shapes import query_shape, verdict_shape
+# the version modules register their rules when imported
+import check_50
+import check_60
+import check_80
+
+versions = ["5.0", "6.0", "8.0"]
+
+def check_line(findings, entry, cache=None, writer=None, forced=False):
+    # every entry is decoded once and the parsed object is shared by all the versions
+    check_entry(findings, decode(entry), entry, cache, writer, forced)
+
+def check_entry(findings, jentry, entry, cache=None, writer=None, forced=False):
+    if cache is None or entry_command(jentry) is None:
+        for version in versions:
+            for finding in run_rules(version, jentry, entry):
+                add_finding(findings, finding, jentry, writer, forced)
+        return
+
+    # the command rules only depend on the shape of the command, their verdicts are reused from the cache
+    key = verdict_shape(jentry)
+    verdicts = cache.get(key)
+    if verdicts is None:
+        verdicts = [run_command_rules(version, jentry) for version in versions]
+        cache.put(key, query_shape(jentry), verdicts)
+    for version, verdict in zip(versions, verdicts):
+        for finding in verdict:
+            add_finding(findings, finding, jentry, writer, forced)
+        for finding in run_entry_rules(version, jentry, entry):
+            add_finding(findings, finding, jentry, writer, forced)
+
+def check_profiled(findings, entries, cache, stats, writer, flagged):
+    # the loop of check, timing the reading, the decoding and the rules of every line
+    entries = iter(entries)
+    clock = time.perf_counter
+    forced = False
+    while True:
+        start = clock()
+        entry = next(entries, None)
+        decoded = clock()
+        stats.seconds["io"] += decoded - start
+        if entry is None:
+            break
+        if flagged:
+            entry, forced = entry
+        jentry = decode(entry)
+        checked = clock()
+        stats.seconds["decode"] += checked - decoded
+        check_entry(findings, jentry, entry, cache, writer, forced)
+        stats.seconds["rules"] += clock() - checked
+        stats.lines["decoded"] += 1
+        if entry_command(jentry) is not None:
+            stats.lines["checked"] += 1
+
+def check(entries, cache=None, stats=None, writer=None, flagged=False):
+    # with flagged, entries are (entry, forced) pairs, the findings of the forced entries are counted as forced
+    findings = {}
+    if stats is not None:
+        check_profiled(findings, entries, cache, stats, writer, flagged)
+    elif flagged:
+        for entry, forced in entries:
+            check_line(findings, entry, cache, writer, forced)
+    else:
+        for entry in entries:
+            check_line(findings, entry, cache, writer)
+
+    if cache is not None:
+        cache.flush()
+    return findings
@@ -0,0 +1,112 @@
+import datetime
+from shapes import query_shape
+
+# Findings are aggregated by version, rule, query shape and location, so memory grows with the number of distinct
+# shapes rather than with the number of log lines. Every finding keeps the message of its first occurrence
+# as a sample.
+
+def utc_timestamp(value):
+    # a t.$date in UTC, like 2024-01-31T12:00:00.000+00:00. mongod logs local times by default, with the offset
+    # of the host, and these only compare as strings once they share the offset. None when it is not a date.
+    if not isinstance(value, str):
+        return None
+    if len(value) == 29 and value.endswith("+00:00"):
+        return value
+    try:
+        timestamp = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp.astimezone(datetime.timezone.utc).isoformat(timespec="milliseconds")
+
+def entry_timestamp(jentry):
+    t = jentry.get("t")
+    if isinstance(t, dict):
+        return utc_timestamp(t.get("$date"))
+    return None
+
+def entry_attr(jentry):
+    attr = jentry.get("attr")
+    if isinstance(attr, dict):
+        return attr
+    return {}
+
+def finding_key(finding):
+    # the key of an aggregated finding in findings
+    return (finding["version"], finding["rule"], finding["shape"], finding["location"])
+
+def add_finding(findings, finding, jentry, writer=None, forced=False):
+    # finding is the Finding returned by a rule, writer, when given, receives every occurrence as it is found.
+    # forced occurrences come from the lines the fraction sampler always checks, they are also counted as forced
+    # so the estimates can leave them out.
+    if finding.shape is None:
+        finding.shape = query_shape(jentry)
+    timestamp = entry_timestamp(jentry)
+    attr = entry_attr(jentry)
+    if writer is not None:
+        writer.write({
+            "t": timestamp,
+            "version": finding.version,
+            "rule": finding.rule,
+            "severity": finding.severity,
+            "ns": attr.get("ns"),
+            "appName": attr.get("appName"),
+            "shape": finding.shape,
+            "location": finding.location,
+            "message": finding.message,
+        })
+    key = (finding.version, finding.rule, finding.shape, finding.location)
+    current = findings.get(key)
+    if current is None:
+        findings[key] = {
+            "version": finding.version,
+            "rule": finding.rule,
+            "severity": finding.severity,
+            "ns": attr.get("ns"),
+            "shape": finding.shape,
+            "location": finding.location,
+            "message": finding.message,
+            "count": 1,
+            "first": timestamp,
+            "last": timestamp,
+        }
+        if forced:
+            findings[key]["forced"] = 1
+        return
+
+    current["count"] += 1
+    if forced:
+        current["forced"] = current.get("forced", 0) + 1
+    if timestamp is not None:
+        if current["first"] is None or timestamp < current["first"]:
+            current["first"] = timestamp
+        if current["last"] is None or timestamp > current["last"]:
+            current["last"] = timestamp
+
+def earlier(finding, other):
+    # whether other occurred before finding, by first occurrence and then by message so the order is total
+    if other["first"] is None:
+        return False
+    if finding["first"] is None or other["first"] < finding["first"]:
+        return True
+    return other["first"] == finding["first"] and other["message"] < finding["message"]
+
+def merge_findings(findings, other):
+    # folds the findings of another scan into findings. The sample of the earliest occurrence is kept, so the
+    # result does not depend on the order the scans are merged in.
+    for key, finding in other.items():
+        current = findings.get(key)
+        if current is None:
+            findings[key] = dict(finding)
+            continue
+
+        if earlier(current, finding):
+            current["message"] = finding["message"]
+        current["count"] += finding["count"]
+        if finding["first"] is not None and (current["first"] is None or finding["first"] < current["first"]):
+            current["first"] = finding["first"]
+        if finding["last"] is not None and (current["last"] is None or finding["last"] > current["last"]):
+            current["last"] = finding["last"]
+
+    return findings
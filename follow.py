@@ -0,0 +1,89 @@
+import os
+import time
+from applications import default_filter
+from engine import check_line
+from reader import is_query_line
+
+read_size = 1024 * 1024
+
+def rotated(f, file_path):
+    # the path now points to another file, the one being read was renamed by a log rotation
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        # renamed, the new log is not created yet
+        return False
+    current = os.fstat(f.fileno())
+    return (stat.st_dev, stat.st_ino) != (current.st_dev, current.st_ino)
+
+def follow_lines(file_path, poll_interval=1.0):
+    # yields the lines appended to file_path as they are written, and None every time it waits for more.
+    # The file is read from its end, after a rotation the new file is read from its beginning.
+    f = None
+    from_start = False
+    pending = b""
+    while True:
+        if f is None:
+            try:
+                f = open(file_path, 'rb')
+            except FileNotFoundError:
+                yield None
+                time.sleep(poll_interval)
+                continue
+            if not from_start:
+                f.seek(0, os.SEEK_END)
+            from_start = True
+
+        chunk = f.read(read_size)
+        if chunk:
+            lines = (pending + chunk).split(b"\n")
+            # the last piece is a line still being written
+            pending = lines.pop()
+            for line in lines:
+                yield line + b"\n"
+            continue
+
+        if rotated(f, file_path):
+            # the renamed file was read to its end above
+            if pending:
+                yield pending
+            f.close()
+            f = None
+            pending = b""
+            continue
+
+        if os.fstat(f.fileno()).st_size < f.tell():
+            # truncated in place (copytruncate), the file starts over
+            f.seek(0)
+            pending = b""
+            continue
+
+        yield None
+        time.sleep(poll_interval)
+
+def follow_query_lines(file_path, app_filter=default_filter, poll_interval=1.0):
+    for line in follow_lines(file_path, poll_interval):
+        if line is None:
+            yield None
+        elif is_query_line(line, app_filter):
+            yield line.decode('utf-8', errors='replace')
+
+def follow(file_path, report, interval=60, app_filter=default_filter, poll_interval=1.0, cache=None, writer=None):
+    # checks the lines written to a live log until interrupted, calling report with the findings every interval seconds.
+    # Findings are aggregated by shape, so memory does not grow with the time it runs.
+    findings = {}
+    next_report = time.monotonic() + interval
+    try:
+        for line in follow_query_lines(file_path, app_filter, poll_interval):
+            if line is not None:
+                check_line(findings, line, cache, writer)
+            elif writer is not None:
+                # waiting for new lines, the occurrences found so far are written out
+                writer.flush()
+            if time.monotonic() >= next_report:
+                report(findings)
+                next_report = time.monotonic() + interval
+    except KeyboardInterrupt:
+        pass
+
+    report(findings)
@@ -0,0 +1,146 @@
+import argparse
+import datetime
+import json
+import math
+import random
+
+# Deterministic generator of MongoDB 4.4 structured log lines, used by the benchmark. The same seed and
+# settings always produce the same lines.
+
+default_mix = {
+    "find": 40,
+    "aggregate": 15,
+    "insert": 12,
+    "update": 10,
+    "delete": 5,
+    "getMore": 8,
+    "findAndModify": 4,
+    "legacy": 3,
+    "invalid": 2,
+    "removed": 1,
+}
+
+noise_messages = [
+    ("NETWORK", 22943, "Connection accepted", lambda rng, i: { "remote": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}:{rng.randrange(1024, 65536)}", "connectionId": i, "connectionCount": rng.randrange(1, 500) }),
+    ("NETWORK", 22944, "Connection ended", lambda rng, i: { "remote": f"10.0.{rng.randrange(256)}.{rng.randrange(256)}:{rng.randrange(1024, 65536)}", "connectionId": i, "connectionCount": rng.randrange(1, 500) }),
+    ("ACCESS", 20250, "Authentication succeeded", lambda rng, i: { "mechanism": "SCRAM-SHA-256", "principalName": f"user{rng.randrange(50)}", "authenticationDatabase": "admin", "remote": f"10.0.0.{rng.randrange(256)}:{rng.randrange(1024, 65536)}" }),
+    ("REPL", 21215, "Replication heartbeat", lambda rng, i: { "target": f"rs{rng.randrange(3)}.example.net:27017", "durationMillis": rng.randrange(5) }),
+    ("STORAGE", 22430, "WiredTiger message", lambda rng, i: { "message": f"[{rng.randrange(10 ** 9)}:{rng.randrange(10 ** 6)}][{rng.randrange(10 ** 5)}:0x7f] WT_SESSION.checkpoint: Checkpoint has been running" }),
+]
+
+internal_applications = ["MongoDB Automation Agent v13.10.0 (git: 1a2b3c)", "OplogFetcher"]
+user_applications = ["orders-service", "billing-api", "MongoDB Shell", "reporting"]
+collections = ["orders", "customers", "invoices", "events", "sessions"]
+
+def payload(rng, size):
+    return f"{rng.getrandbits(size * 4):0{size}x}"
+
+def filter_document(rng, padding):
+    choice = rng.randrange(10)
+    if choice == 0:
+        return { "status": None, "note": padding }
+    if choice == 1:
+        return { "qty": { "$mod": [rng.randrange(2, 10), 0] }, "note": padding }
+    if choice == 2:
+        return { "$query": { "customer": padding }, "$orderby": { "date": -1 } }
+    if choice == 3:
+        return { "tags": { "$in": [padding, None] } }
+    return { "customer": padding, "qty": { "$gt": rng.randrange(1000) }, "status": rng.choice(["A", "B", "C"]) }
+
+def build_command(rng, kind, collection, padding):
+    if kind == "find":
+        command = { "find": collection, "filter": filter_document(rng, padding) }
+        if rng.random() < 0.3:
+            command["sort"] = { "date": -1 }
+        if rng.random() < 0.2:
+            command["limit"] = rng.randrange(1, 100)
+        return command
+    if kind == "aggregate":
+        return { "aggregate": collection, "pipeline": [{ "$match": filter_document(rng, padding) }, { "$group": { "_id": "$status", "total": { "$sum": "$qty" } } }], "cursor": {} }
+    if kind == "insert":
+        return { "insert": collection, "documents": [{ "_id": rng.randrange(10 ** 9), "body": padding }], "ordered": True }
+    if kind == "update":
+        return { "update": collection, "updates": [{ "q": filter_document(rng, padding), "u": { "$set": { "status": "B" } }, "multi": rng.random() < 0.5 }], "ordered": True }
+    if kind == "delete":
+        return { "delete": collection, "deletes": [{ "q": filter_document(rng, padding), "limit": 0 }], "ordered": True }
+    if kind == "getMore":
+        return { "getMore": rng.randrange(10 ** 12), "collection": collection, "batchSize": 101 }
+    if kind == "findAndModify":
+        return { "findAndModify": collection, "query": { "customer": padding }, "update": { "$inc": { "qty": 1 } }, "new": True }
+    if kind == "legacy":
+        return { "find": collection, "filter": { "$query": { "customer": padding }, "$maxTimeMS": 100 }, "ntoreturn": 1 }
+    if kind == "invalid":
+        return { "find": collection, "filter": { "customer": padding }, "maxScan": 1000 }
+    return { rng.choice(["geoSearch", "reIndex", "unsetSharding"]): collection, "note": padding }
+
+def generate(lines, seed=0, slow_ratio=0.2, internal_ratio=0.05, mix=default_mix, mean_size=600):
+    # yields lines whose sizes follow a log-normal distribution around mean_size bytes
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    for i in range(lines):
+        timestamp = (start + datetime.timedelta(milliseconds=i * 10)).isoformat(timespec="milliseconds")
+        size = int(rng.lognormvariate(math.log(mean_size), 0.6))
+        if rng.random() >= slow_ratio:
+            component, log_id, msg, attributes = rng.choice(noise_messages)
+            line = { "t": { "$date": timestamp }, "s": "I", "c": component, "id": log_id, "ctx": f"conn{i}", "msg": msg, "attr": attributes(rng, i) }
+            yield json.dumps(line, separators=(",", ":")) + "\n"
+            continue
+
+        kind = rng.choices(kinds, weights)[0]
+        collection = rng.choice(collections)
+        app_name = rng.choice(internal_applications) if rng.random() < internal_ratio else rng.choice(user_applications)
+        command = build_command(rng, kind, collection, payload(rng, max(1, size - 450)))
+        command["lsid"] = { "id": { "$uuid": "5f0c4a9e-1f3b-4b8a-9a33-0e8c1f4b9d2a" } }
+        command["$db"] = "shop"
+        attr = {
+            "type": "command",
+            "ns": f"shop.{collection}",
+            "appName": app_name,
+            "command": command,
+            "planSummary": "COLLSCAN",
+            "keysExamined": 0,
+            "docsExamined": rng.randrange(10 ** 6),
+            "numYields": rng.randrange(100),
+            "reslen": rng.randrange(10 ** 5),
+            "protocol": "op_query" if kind == "legacy" else "op_msg",
+            "durationMillis": rng.randrange(100, 5000),
+        }
+        if kind == "legacy":
+            attr["opType"] = "OP_QUERY"
+        line = { "t": { "$date": timestamp }, "s": "I", "c": "COMMAND", "id": 51803, "ctx": f"conn{i}", "msg": "Slow query", "attr": attr }
+        yield json.dumps(line, separators=(",", ":")) + "\n"
+
+def parse_mix(value):
+    # "find=40,insert=10" -> {"find": 40, "insert": 10}
+    mix = {}
+    for item in value.split(","):
+        kind, weight = item.split("=")
+        if kind not in default_mix:
+            raise argparse.ArgumentTypeError(f"Unknown command kind {kind}, the supported ones are {', '.join(default_mix)}")
+        mix[kind] = float(weight)
+    return mix
+
+def add_arguments(parser):
+    parser.add_argument('--lines', type=int, default=100000, help="Number of log lines to generate.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the generator, the same seed produces the same lines.")
+    parser.add_argument('--slow-ratio', type=float, default=0.2, help="Fraction of the lines that are slow queries, the others are network, access, replication and storage messages.")
+    parser.add_argument('--internal-ratio', type=float, default=0.05, help="Fraction of the slow queries sent by MongoDB internal applications.")
+    parser.add_argument('--mix', type=parse_mix, default=default_mix, help=f"Relative weight of every command kind, like find=40,insert=10. Kinds: {', '.join(default_mix)}.")
+    parser.add_argument('--mean-size', type=int, default=600, help="Mean size in bytes of the slow query lines.")
+
+def write_log(file_path, args):
+    with open(file_path, 'w') as f:
+        for line in generate(args.lines, args.seed, args.slow_ratio, args.internal_ratio, args.mix, args.mean_size):
+            f.write(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic MongoDB 4.4 log.")
+    parser.add_argument('--output', type=str, required=True, help="File the log is written to.")
+    add_arguments(parser)
+    args = parser.parse_args()
+    write_log(args.output, args)
+
+if __name__ == "__main__":
+    main()
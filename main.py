@@ -1,10 +1,33 @@
 import argparse
-from check_50 import check as check50
-from check_60 import check as check60
-from check_80 import check as check80
 import os
+import socket
+import sys
+from applications import ApplicationFilter, mongodb_internal_application
+from cache import VerdictCache
+from decoder import backends, use_backend
+from engine import check, versions
+from follow import follow
+from parallel import scan
+from partials import new_partial, save_partial
+from reader import iter_log_files, iter_segments_query_lines
+from reports import open_writer, write_summary, writers
+from rules import rule_names, select_rules, severities
+from sampling import sample_fraction, sample_reservoir
+from state import load_state, plan_segments, save_state, update_state
+from timewindow import parse_time, window_segments
+import stats
 
-mongodb_internal_application = ["MongoDB Automation Agent", "OplogFetcher"]
+def print_findings(findings, out=sys.stdout):
+    for version in ["5.0", "6.0", "8.0"]:
+        print(f"Checking version {version[0]} compatibility", file=out)
+        for finding in findings.values():
+            if finding["version"] == version:
+                print(f"   { finding['message'] }", file=out)
+                if "estimate" in finding:
+                    print(f"      {finding['count']} sampled queries, about {finding['estimate']} in total (95% between {finding['low']} and {finding['high']}), between {finding['first']} and {finding['last']} with shape {finding['shape']}", file=out)
+                else:
+                    print(f"      {finding['count']} queries between {finding['first']} and {finding['last']} with shape {finding['shape']}", file=out)
+    out.flush()
 
 def main():
     parser = argparse.ArgumentParser(description="Script to check compatibility using logs.")
@@ -14,37 +37,245 @@ def main():
         required=True,
         help="Path to the directory where the logs are located."
     )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help="Number of processes used to scan the logs."
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        help="Size in MB of the byte ranges large files are split into when using several workers, 256 by default."
+    )
+    parser.add_argument(
+        '--exclude-app',
+        action='append',
+        default=[],
+        help="Application name (attr.appName) whose queries are not checked, in addition to the MongoDB internal applications. Can be repeated."
+    )
+    parser.add_argument(
+        '--include-app',
+        action='append',
+        default=[],
+        help="Only check the queries of this application name (attr.appName). Can be repeated."
+    )
+    parser.add_argument(
+        '--json-backend',
+        choices=["auto"] + list(backends),
+        default="auto",
+        help="JSON library used to decode the log entries, auto picks the fastest one installed."
+    )
+    parser.add_argument(
+        '--state-file',
+        type=str,
+        help="File recording what was already scanned, the following runs only process the new lines and report the accumulated findings."
+    )
+    parser.add_argument(
+        '--follow',
+        action='store_true',
+        help="Keep checking the lines appended to the log file given in --log-path, following its rotations, until interrupted."
+    )
+    parser.add_argument(
+        '--report-interval',
+        type=int,
+        default=60,
+        help="Seconds between two reports when using --follow."
+    )
+    parser.add_argument(
+        '--cache-file',
+        type=str,
+        help="SQLite file caching the verdicts of the rules by query shape, so shapes already checked in previous runs are not checked again."
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=100000,
+        help="Maximum number of query shapes kept in the cache file."
+    )
+    parser.add_argument(
+        '--stats',
+        action='store_true',
+        help="Print the lines read, filtered, decoded and checked, the time spent reading, decoding and running the rules, and the calls, hits and time of every rule."
+    )
+    parser.add_argument(
+        '--stats-file',
+        type=str,
+        help="JSON file the statistics of --stats are written to, they are collected even without --stats."
+    )
+    parser.add_argument(
+        '--report-format',
+        choices=list(writers),
+        help="Write every occurrence of a finding to --report-file as soon as it is found, as NDJSON or CSV."
+    )
+    parser.add_argument(
+        '--report-file',
+        type=str,
+        default="-",
+        help="File the occurrences are written to with --report-format, - for the standard output."
+    )
+    parser.add_argument(
+        '--summary-file',
+        type=str,
+        help="JSON file the counts of findings per version, rule, namespace and shape are written to at the end of the scan, - for the standard output."
+    )
+    parser.add_argument(
+        '--target-version',
+        action='append',
+        choices=versions,
+        help="Only run the rules of this version. Can be repeated."
+    )
+    parser.add_argument(
+        '--rule',
+        action='append',
+        help="Only run this rule, named like in the reports. Can be repeated."
+    )
+    parser.add_argument(
+        '--severity',
+        action='append',
+        choices=severities,
+        help="Only report the findings of this severity. Can be repeated."
+    )
+    parser.add_argument(
+        '--since',
+        type=parse_time,
+        help="Only check the lines logged at or after this time, a date like 2024-01-31, a time like 2024-01-31T12:00:00+00:00 (UTC without offset) or a time relative to now like 7d, 12h or 30m."
+    )
+    parser.add_argument(
+        '--until',
+        type=parse_time,
+        help="Only check the lines logged at or before this time, in the same formats as --since."
+    )
+    parser.add_argument(
+        '--sample',
+        type=float,
+        help="Only check this fraction of the slow queries, between 0 and 1, and estimate the number of queries of every finding. The first query of every command name is always checked."
+    )
+    parser.add_argument(
+        '--sample-per-shape',
+        type=int,
+        help="Only check a random sample of this many queries per query shape, and estimate the number of queries of every finding."
+    )
+    parser.add_argument(
+        '--sample-seed',
+        type=int,
+        default=0,
+        help="Seed of the random sampling, the same seed samples the same queries."
+    )
+    parser.add_argument(
+        '--partial-file',
+        type=str,
+        help="File the findings are written to as a partial report, to be merged with the ones of other hosts by merge.py. Compressed when it ends with .gz."
+    )
+    parser.add_argument(
+        '--host-name',
+        type=str,
+        default=socket.gethostname(),
+        help="Name of this host in the partial report, the name of the machine by default."
+    )
     args = parser.parse_args()
+    sampling = args.sample is not None or args.sample_per_shape is not None
+    if sampling and (args.workers > 1 or args.follow or args.state_file or args.sample is not None and args.sample_per_shape is not None):
+        parser.error("--sample and --sample-per-shape cannot be combined, nor used with --workers, --follow or --state-file")
+    if args.sample is not None and not 0 < args.sample <= 1:
+        parser.error("--sample must be between 0 and 1")
+    if args.sample_per_shape is not None and args.sample_per_shape < 1:
+        parser.error("--sample-per-shape must be positive")
+    if (args.since or args.until) and (args.follow or args.state_file):
+        parser.error("--since and --until cannot be used with --follow or --state-file")
+    if args.follow and (args.stats or args.stats_file):
+        parser.error("--stats and --stats-file cannot be used with --follow")
+    if args.follow and (args.state_file or args.workers > 1 or args.chunk_size is not None):
+        parser.error("--state-file, --workers and --chunk-size cannot be used with --follow")
+    if args.follow and not os.path.isfile(args.log_path):
+        parser.error("--log-path must be a log file when using --follow")
+    if args.chunk_size is None:
+        args.chunk_size = 256
+    if args.workers < 1 or args.chunk_size < 1 or args.report_interval < 1 or args.cache_size < 1:
+        parser.error("--workers, --chunk-size, --report-interval and --cache-size must be positive")
     log_path = args.log_path
+    app_filter = ApplicationFilter(args.include_app, mongodb_internal_application + args.exclude_app)
+    try:
+        use_backend(args.json_backend)
+    except Exception as e:
+        parser.error(str(e))
+
+    unknown_rules = set(args.rule or []) - rule_names()
+    if unknown_rules:
+        parser.error(f"Unknown rules {', '.join(sorted(unknown_rules))}, the registered ones are {', '.join(sorted(rule_names()))}")
+    # the rules that are not selected are removed from the registry, so they cost nothing
+    selection = (args.target_version, args.rule, args.severity)
+    select_rules(*selection)
+
+    cache_settings = (args.cache_file, args.cache_size) if args.cache_file else None
+    writer = open_writer(args.report_format, args.report_file) if args.report_format else None
+    # the text report moves to the standard error when the standard output carries a machine-readable one
+    to_stdout = args.summary_file == "-" or (args.report_format and args.report_file == "-")
+    out = sys.stderr if to_stdout else sys.stdout
+
+    def report(findings):
+        print_findings(findings, out)
+        if args.summary_file:
+            write_summary(args.summary_file, findings)
+        # a followed log rewrites its partial at every report and when it stops
+        if args.partial_file:
+            save_partial(args.partial_file, new_partial(findings, args.host_name))
+
+    if args.follow:
+        cache = VerdictCache(*cache_settings) if cache_settings else None
+        follow(log_path, report, args.report_interval, app_filter, cache=cache, writer=writer)
+        if cache is not None:
+            cache.close()
+        if writer is not None:
+            writer.close()
+        return
+
+    if args.state_file:
+        state = load_state(args.state_file)
+        segments, files = plan_segments(iter_log_files(log_path), state)
+    else:
+        segments = [(file_path, 0, None) for file_path in iter_log_files(log_path)]
+
+    window = None
+    if args.since or args.until:
+        # log files are time-ordered, only the part of them within the window is read
+        window = (args.since, args.until)
+        segments = list(window_segments(segments, *window))
+
+    # the rules are only profiled when statistics are asked for
+    scan_stats = stats.start() if args.stats or args.stats_file else None
+    sample_counts = None
+    if sampling:
+        cache = VerdictCache(*cache_settings) if cache_settings else None
+        lines = iter_segments_query_lines(segments, app_filter, scan_stats, window)
+        if args.sample is not None:
+            findings, sample_counts = sample_fraction(lines, args.sample, args.sample_seed, cache, scan_stats, writer)
+        else:
+            findings, sample_counts = sample_reservoir(lines, args.sample_per_shape, args.sample_seed, cache, scan_stats, writer)
+        if cache is not None:
+            cache.close()
+    elif args.workers > 1:
+        findings = scan(segments, args.workers, args.chunk_size * 1024 * 1024, app_filter, args.json_backend, cache_settings, scan_stats, writer, selection, window)
+    else:
+        cache = VerdictCache(*cache_settings) if cache_settings else None
+        findings = check(iter_segments_query_lines(segments, app_filter, scan_stats, window), cache, scan_stats, writer)
+        if cache is not None:
+            cache.close()
+
+    if args.state_file:
+        findings = update_state(state, files, findings)
+        save_state(args.state_file, state)
+
+    if writer is not None:
+        writer.close()
 
-    query_lines = []
-    for root, _, files in os.walk(log_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            with open(file_path, 'r') as f:
-                for line in f:
-                    # exclude lines that are comming from mongodb applications, like MongoDB Automation Agent
-                    if not any(app in line for app in mongodb_internal_application):
-                        if "Slow query" in line:
-                            query_lines.append(line)
-
-    print("Checking version 5 compatibility")
-    results_50 = check50(query_lines)
-    if len(results_50["errors"]) > 0:
-        for error in results_50["errors"]:
-            print(f"   { error }")
-
-    print("Checking version 6 compatibility")
-    results_60 = check60(query_lines)
-    if len(results_60["errors"]) > 0:
-        for error in results_60["errors"]:
-            print(f"   { error }")
-
-    print("Checking version 8 compatibility")
-    results_80 = check80(query_lines)
-    if len(results_80["errors"]) > 0:
-        for error in results_80["errors"]:
-            print(f"   { error }")
+    report(findings)
+    if sample_counts is not None:
+        print(f"Checked {sample_counts['sampled']} of {sample_counts['lines']} slow queries", file=out)
+    if args.stats:
+        stats.print_stats(scan_stats, out)
+    if args.stats_file:
+        stats.save_stats(args.stats_file, scan_stats)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
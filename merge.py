@@ -0,0 +1,37 @@
+import argparse
+from main import print_findings
+from partials import load_partial, merge_partials, partial_findings, save_partial
+from reports import write_summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the partial reports of several hosts into one report.")
+    parser.add_argument(
+        'partials',
+        nargs='+',
+        help="Partial report files written with --partial-file, or merged by a previous run."
+    )
+    parser.add_argument(
+        '--output',
+        type=str,
+        help="File the merged partial report is written to, so it can be merged again."
+    )
+    parser.add_argument(
+        '--summary-file',
+        type=str,
+        help="JSON file the counts of findings per version, rule, severity, namespace and shape are written to."
+    )
+    args = parser.parse_args()
+
+    # partials are read one at a time, only the merged findings are kept
+    merged = merge_partials(load_partial(file_path) for file_path in args.partials)
+    if args.output:
+        save_partial(args.output, merged)
+
+    findings = partial_findings(merged)
+    print_findings(findings)
+    print(f"Merged {len(args.partials)} partial reports from {len(merged['hosts'])} hosts")
+    if args.summary_file:
+        write_summary(args.summary_file, findings)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+from multiprocessing import Pool
+import os
+import tempfile
+from applications import default_filter
+from cache import VerdictCache
+from decoder import use_backend
+from engine import check
+from findings import merge_findings
+from reader import is_plain_log, iter_file_query_lines
+from reports import append_part, open_writer
+from rules import select_rules
+import stats
+
+def plan_tasks(segments, chunk_size, app_filter=default_filter, cache_settings=None):
+    # one task per segment (file_path, start, end), uncompressed segments bigger than chunk_size are split into byte ranges
+    for file_path, start, end in segments:
+        if not is_plain_log(file_path):
+            yield (file_path, start, end, app_filter, cache_settings)
+            continue
+        if end is None:
+            end = os.path.getsize(file_path)
+        for range_start in range(start, end, chunk_size):
+            yield (file_path, range_start, min(range_start + chunk_size, end), app_filter, cache_settings)
+
+def init_worker(json_backend, profile, selection):
+    use_backend(json_backend)
+    if selection is not None:
+        select_rules(*selection)
+    if profile:
+        stats.enable_profiling()
+
+def scan_task(task):
+    file_path, start, end, app_filter, cache_settings, profile, part, window = task
+    # with profile every task counts into its own stats, returned with its findings.
+    # part is the report format and the file the task writes its occurrences to, None without a report writer.
+    task_stats = stats.start() if profile else None
+    # every task opens its own connection to the verdict cache
+    cache = VerdictCache(*cache_settings) if cache_settings is not None else None
+    writer = open_writer(part[0], part[1], header=False) if part is not None else None
+    try:
+        return check(iter_file_query_lines(file_path, start, end, app_filter, task_stats, window), cache, task_stats, writer), task_stats
+    finally:
+        if cache is not None:
+            cache.close()
+        if writer is not None:
+            writer.close()
+
+def scan(segments, workers, chunk_size, app_filter=default_filter, json_backend="auto", cache_settings=None, scan_stats=None, writer=None, selection=None, window=None):
+    # cache_settings are the arguments of VerdictCache, None to run every rule. The stats of the tasks are merged into scan_stats.
+    # selection holds the arguments of select_rules, None to run every rule. window is the (since, until) time window of the scan.
+    # imap returns the results in task order, so the merged findings do not depend on which worker finishes first, and the
+    # report every task writes in its own file is appended to writer as soon as the tasks before it are done.
+    findings = {}
+    profile = scan_stats is not None
+    with tempfile.TemporaryDirectory() as parts_path:
+        tasks = (
+            task + (profile, (writer.format, os.path.join(parts_path, f"{index}.part")) if writer is not None else None, window)
+            for index, task in enumerate(plan_tasks(segments, chunk_size, app_filter, cache_settings))
+        )
+        with Pool(workers, initializer=init_worker, initargs=(json_backend, profile, selection)) as pool:
+            for index, (task_findings, task_stats) in enumerate(pool.imap(scan_task, tasks)):
+                merge_findings(findings, task_findings)
+                if profile:
+                    scan_stats.merge(task_stats)
+                if writer is not None:
+                    append_part(writer, os.path.join(parts_path, f"{index}.part"))
+
+    return findings
@@ -0,0 +1,120 @@
+import gzip
+import json
+import os
+from findings import finding_key, utc_timestamp
+
+# Partial reports let every host scan its own logs and ship its findings to a central place, where any number
+# of them are merged into a fleet-wide report. A partial holds the findings keyed by version, rule, shape and
+# location, with their counts, first and last timestamps, the hosts they were seen on and a few samples.
+# Merging is associative and commutative: counts and estimates add up, timestamps keep their minimum and
+# maximum, hosts are united and the earliest samples are kept, so partials can be merged in any order and
+# grouping, including partials that were already merged. Files ending in .gz are compressed.
+
+partial_format = "mdb-compatibility-partial"
+partial_version = 1
+sample_size = 5
+
+def open_partial(file_path, mode):
+    if file_path.endswith(".gz"):
+        return gzip.open(file_path, mode + 't')
+    return open(file_path, mode)
+
+def partial_finding(finding, host):
+    partial = {
+        "version": finding["version"],
+        "rule": finding["rule"],
+        "severity": finding["severity"],
+        "ns": finding["ns"],
+        "shape": finding["shape"],
+        "location": finding["location"],
+        "count": finding["count"],
+        "first": finding["first"],
+        "last": finding["last"],
+        "hosts": [host],
+        "samples": [{ "t": finding["first"], "host": host, "message": finding["message"] }],
+    }
+    if "estimate" in finding:
+        partial["estimate"] = finding["estimate"]
+        partial["low"] = finding["low"]
+        partial["high"] = finding["high"]
+    return partial
+
+def new_partial(findings, host):
+    return {
+        "format": partial_format,
+        "version": partial_version,
+        "hosts": [host],
+        "findings": [partial_finding(finding, host) for finding in findings.values()],
+    }
+
+def save_partial(file_path, partial):
+    # written next to its path and renamed, a followed log rewrites it while it may be shipped
+    directory, name = os.path.split(file_path)
+    temporary = os.path.join(directory, f".{name}")
+    with open_partial(temporary, 'w') as f:
+        json.dump(partial, f, separators=(",", ":"))
+    os.replace(temporary, file_path)
+
+def load_partial(file_path):
+    with open_partial(file_path, 'r') as f:
+        partial = json.load(f)
+    if not isinstance(partial, dict) or partial.get("format") != partial_format:
+        raise Exception(f"{file_path} is not a partial report")
+    if partial.get("version") != partial_version:
+        raise Exception(f"{file_path} is a partial report of version {partial.get('version')}, this version reads version {partial_version}")
+    # the timestamps are compared in UTC, partials written with the local times of their hosts are converted
+    for finding in partial["findings"]:
+        finding["first"] = utc_timestamp(finding["first"])
+        finding["last"] = utc_timestamp(finding["last"])
+        for sample in finding["samples"]:
+            sample["t"] = utc_timestamp(sample["t"])
+    return partial
+
+def sample_order(sample):
+    return (sample["t"] is None, sample["t"] or "", sample["host"], sample["message"])
+
+def bound(finding, name):
+    # a finding of a full scan is exact, its estimate and bounds are its count
+    return finding.get(name, finding["count"])
+
+def merge_finding(current, other):
+    sampled = "estimate" in current or "estimate" in other
+    if sampled:
+        for name in ["estimate", "low", "high"]:
+            current[name] = bound(current, name) + bound(other, name)
+    current["count"] += other["count"]
+    if other["first"] is not None and (current["first"] is None or other["first"] < current["first"]):
+        current["first"] = other["first"]
+    if other["last"] is not None and (current["last"] is None or other["last"] > current["last"]):
+        current["last"] = other["last"]
+    current["hosts"] = sorted(set(current["hosts"]) | set(other["hosts"]))
+    samples = { sample_order(sample): sample for sample in current["samples"] + other["samples"] }
+    current["samples"] = [samples[order] for order in sorted(samples)[:sample_size]]
+
+def merge_partials(partials):
+    merged = {}
+    hosts = set()
+    for partial in partials:
+        hosts.update(partial["hosts"])
+        for finding in partial["findings"]:
+            key = finding_key(finding)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = dict(finding)
+            else:
+                merge_finding(current, finding)
+
+    return {
+        "format": partial_format,
+        "version": partial_version,
+        "hosts": sorted(hosts),
+        # sorted so the merged partial is the same whatever the order of the partials
+        "findings": [merged[key] for key in sorted(merged, key=lambda key: json.dumps(key))],
+    }
+
+def partial_findings(partial):
+    # the findings of a partial as a scan returns them, the message being the earliest sample
+    findings = {}
+    for finding in partial["findings"]:
+        findings[finding_key(finding)] = dict(finding, message=finding["samples"][0]["message"])
+    return findings
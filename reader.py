@@ -0,0 +1,194 @@
+import bz2
+import datetime
+import gzip
+import io
+import lzma
+import mmap
+import os
+from applications import default_filter
+from bsonreader import is_profile_dump, iter_profile_query_lines
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+def iter_log_files(log_path):
+    # files are visited in a stable order so runs over the same logs report findings in the same order
+    for root, dirs, files in os.walk(log_path):
+        dirs.sort()
+        for file in sorted(files):
+            yield os.path.join(root, file)
+
+# rotated logs are usually archived compressed, the format is detected from the first bytes of the file
+compression_magic = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+
+def detect_compression(file_path):
+    with open(file_path, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in compression_magic:
+        if head.startswith(magic):
+            return compression
+    return None
+
+def is_plain_log(file_path):
+    # an uncompressed log, the only files that can be read from a byte offset
+    return detect_compression(file_path) is None and not is_profile_dump(file_path)
+
+def open_log(file_path):
+    # compressed files are decompressed while they are read, nothing is written to disk
+    compression = detect_compression(file_path)
+    if compression is None:
+        return open(file_path, 'rb')
+    if compression == "gzip":
+        return gzip.open(file_path, 'rb')
+    if compression == "bz2":
+        return bz2.open(file_path, 'rb')
+    if compression == "xz":
+        return lzma.open(file_path, 'rb')
+    if zstandard is None:
+        raise Exception(f"{file_path} is compressed with zstd, install the zstandard package to read it")
+    reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), read_across_frames=True)
+    return io.BufferedReader(reader)
+
+def iter_file_lines(file_path, start=0, end=None):
+    # yields the raw lines starting within [start, end), so byte ranges of the same file can be read independently.
+    # Byte ranges are offsets in the file as stored, so they can only be used on uncompressed files.
+    with open_log(file_path) as f:
+        if start > 0:
+            # the line crossing start belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        position = f.tell()
+        for line in f:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            yield line
+
+# lines are filtered as bytes, only the ones that can be slow queries are decoded
+slow_query = b"Slow query"
+
+def is_query_line(line, app_filter=default_filter):
+    if slow_query not in line:
+        return False
+    # exclude lines that are comming from mongodb applications, like MongoDB Automation Agent
+    return app_filter.accepts_line(line)
+
+def count_lines(mm, start, end, block_size=16 * 1024 * 1024):
+    # lines starting within [start, end) of the mapped file: the first one and the ones after a newline
+    count = 1 if start == 0 else 0
+    for block_start in range(max(start - 1, 0), end - 1, block_size):
+        count += mm[block_start:min(block_start + block_size, end - 1)].count(b"\n")
+    return count
+
+# every line of a 4.4 log starts with its timestamp, {"t":{"$date":"2020-05-20T19:18:40.604+00:00"},...
+date_marker = b'"$date":"'
+
+def line_timestamp(line):
+    # the t.$date of a raw line as an aware datetime, None when the line has none
+    i = line.find(date_marker, 0, 32)
+    if i == -1:
+        return None
+    i += len(date_marker)
+    j = line.find(b'"', i)
+    try:
+        return datetime.datetime.fromisoformat(line[i:j].decode())
+    except ValueError:
+        return None
+
+def window_lines(lines, since=None, until=None):
+    # the lines of a time-ordered log between since and until, reading stops at the first line after until
+    lines = iter(lines)
+    if since is not None:
+        for line in lines:
+            timestamp = line_timestamp(line)
+            if timestamp is not None and timestamp >= since:
+                if until is not None and timestamp > until:
+                    return
+                yield line
+                break
+    if until is None:
+        yield from lines
+        return
+    for line in lines:
+        timestamp = line_timestamp(line)
+        if timestamp is not None and timestamp > until:
+            return
+        yield line
+
+def iter_mapped_query_lines(file_path, start=0, end=None, app_filter=default_filter, stats=None):
+    # jumps from one "Slow query" occurrence to the next in the mapped file, the lines in between are never read into python
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if end is None or end > size:
+                end = size
+            position = start
+            while True:
+                hit = mm.find(slow_query, position)
+                if hit == -1:
+                    break
+                line_start = mm.rfind(b"\n", 0, hit) + 1
+                if line_start >= end:
+                    break
+                line_end = mm.find(b"\n", hit)
+                line_end = size if line_end == -1 else line_end + 1
+                # a line starting before the range belongs to the previous one
+                if line_start >= start:
+                    line = mm[line_start:line_end]
+                    if app_filter.accepts_line(line):
+                        yield line.decode('utf-8', errors='replace')
+                    elif stats is not None:
+                        stats.lines["excluded"] += 1
+                position = line_end
+            if stats is not None:
+                stats.lines["read"] += count_lines(mm, start, end)
+
+def iter_file_query_lines(file_path, start=0, end=None, app_filter=default_filter, stats=None, window=None):
+    # window is the (since, until) time window of the scan. The segments of uncompressed files are already cut
+    # to it, compressed files cannot be seeked and their lines are compared to it while they are read.
+    compressed = detect_compression(file_path) is not None
+    if is_profile_dump(file_path):
+        # profile dumps are read whole, their documents are not lines
+        with open_log(file_path) as f:
+            yield from iter_profile_query_lines(f, not compressed, app_filter, stats, window)
+        return
+    if not compressed:
+        yield from iter_mapped_query_lines(file_path, start, end, app_filter, stats)
+        return
+
+    lines = iter_file_lines(file_path, start, end)
+    if window is not None:
+        lines = window_lines(lines, *window)
+    if stats is None:
+        for line in lines:
+            if is_query_line(line, app_filter):
+                yield line.decode('utf-8', errors='replace')
+        return
+
+    for line in lines:
+        stats.lines["read"] += 1
+        if slow_query not in line:
+            continue
+        if app_filter.accepts_line(line):
+            yield line.decode('utf-8', errors='replace')
+        else:
+            stats.lines["excluded"] += 1
+
+def iter_segments_query_lines(segments, app_filter=default_filter, stats=None, window=None):
+    # segments are (file_path, start, end) byte ranges, end being None for the rest of the file
+    for file_path, start, end in segments:
+        yield from iter_file_query_lines(file_path, start, end, app_filter, stats, window)
+
+def iter_query_lines(log_path, app_filter=default_filter):
+    # lines are yielded one at a time so memory does not grow with the size of the logs
+    segments = ((file_path, 0, None) for file_path in iter_log_files(log_path))
+    yield from iter_segments_query_lines(segments, app_filter)
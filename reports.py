@@ -0,0 +1,111 @@
+import csv
+import json
+import os
+import shutil
+import sys
+
+# Writers streaming every occurrence of a finding as it is found, so the report can be consumed while the scan
+# runs. Nothing is kept in memory besides the write buffer.
+
+columns = ["t", "version", "rule", "severity", "ns", "appName", "shape", "location", "message"]
+buffer_size = 1024 * 1024
+
+def open_output(file_path):
+    # "-" is the standard output
+    if file_path == "-":
+        return os.fdopen(os.dup(sys.stdout.fileno()), 'w', buffering=buffer_size, newline='')
+    return open(file_path, 'w', buffering=buffer_size, newline='')
+
+class NdjsonWriter:
+    format = "ndjson"
+
+    def __init__(self, file_path, header=True):
+        self.file = open_output(file_path)
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class CsvWriter:
+    format = "csv"
+
+    def __init__(self, file_path, header=True):
+        self.file = open_output(file_path)
+        self.writer = csv.DictWriter(self.file, columns)
+        if header:
+            self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(record)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+writers = {
+    "ndjson": NdjsonWriter,
+    "csv": CsvWriter,
+}
+
+def open_writer(report_format, file_path, header=True):
+    return writers[report_format](file_path, header)
+
+def append_part(writer, part_path):
+    # copies a report written by a worker, without header, at the end of writer and removes it
+    writer.flush()
+    with open(part_path, 'rb') as part:
+        shutil.copyfileobj(part, writer.file.buffer)
+    writer.file.buffer.flush()
+    os.remove(part_path)
+
+def count_by(counts, key, count):
+    counts[key] = counts.get(key, 0) + count
+
+def summary(findings):
+    # counts per version, rule, severity, namespace and shape of the aggregated findings
+    versions = {}
+    rules = {}
+    severities = {}
+    namespaces = {}
+    for finding in findings.values():
+        count_by(versions, finding["version"], finding["count"])
+        count_by(severities, finding["severity"], finding["count"])
+        count_by(rules, f"{finding['version']} {finding['rule']}", finding["count"])
+        count_by(namespaces, finding.get("ns") or "", finding["count"])
+    return {
+        "total": sum(versions.values()),
+        "versions": versions,
+        "rules": rules,
+        "severities": severities,
+        "namespaces": namespaces,
+        "shapes": [
+            {
+                "version": finding["version"],
+                "rule": finding["rule"],
+                "severity": finding["severity"],
+                "ns": finding.get("ns"),
+                "shape": finding["shape"],
+                "location": finding["location"],
+                "count": finding["count"],
+                "first": finding["first"],
+                "last": finding["last"],
+                "message": finding["message"],
+                # estimated number of queries when sampling
+                "estimate": finding.get("estimate"),
+                "low": finding.get("low"),
+                "high": finding.get("high"),
+            }
+            for finding in findings.values()
+        ],
+    }
+
+def write_summary(file_path, findings):
+    with open_output(file_path) as f:
+        json.dump(summary(findings), f, indent=2)
@@ -0,0 +1,167 @@
+import inspect
+
+# Registry of the rules of every version, filled by the check modules when they are imported.
+#   command_rules[version][command name] -> rules for that command
+#   global_rules[version]                -> rules for every command
+#   entry_rules[version]                 -> rules for every log entry, command or not
+command_rules = {}
+global_rules = {}
+entry_rules = {}
+
+# the severities a finding can have, and the ones kept by select_rules (None for all of them)
+severities = ["error", "warning"]
+selected_severities = None
+# the versions, rules and severities select_rules kept, the verdict cache depends on them
+selection = None
+
+class Finding:
+    # what a rule reports about an entry. The registry fills in the version and the rule, the engine the shape.
+    # location is the dotted path of the offending part of the command, None when it is the whole entry.
+    __slots__ = ("version", "rule", "severity", "message", "location", "shape")
+
+    def __init__(self, message, severity="error", location=None):
+        self.version = None
+        self.rule = None
+        self.severity = severity
+        self.message = message
+        self.location = location
+        self.shape = None
+
+    def to_list(self):
+        return [self.version, self.rule, self.severity, self.message, self.location]
+
+    @staticmethod
+    def from_list(values, shape=None):
+        finding = Finding(values[3], values[2], values[4])
+        finding.version = values[0]
+        finding.rule = values[1]
+        finding.shape = shape
+        return finding
+
+def rule(version, *commands):
+    # command rules are called with (command, jentry), without commands the rule applies to every command
+    def register(func):
+        if commands:
+            by_name = command_rules.setdefault(version, {})
+            for name in commands:
+                by_name.setdefault(name, []).append(func)
+        else:
+            global_rules.setdefault(version, []).append(func)
+        return func
+    return register
+
+def entry_rule(version):
+    # entry rules are called with (jentry, entry), entry being the raw log line
+    def register(func):
+        entry_rules.setdefault(version, []).append(func)
+        return func
+    return register
+
+# parameters holding user documents, the rules never look into them
+payload_parameters = frozenset(["documents"])
+
+def command_name(command):
+    # the name of a command is its first key
+    for name in command:
+        return name
+
+def iter_keys(value, keys, path=""):
+    # the dotted path of every dict key found in value that belongs to keys, in document order and at any depth.
+    # Only keys are compared, the strings and numbers the value contains are never looked at.
+    if isinstance(value, dict):
+        for k, v in value.items():
+            child = f"{path}.{k}" if path else k
+            if k in keys:
+                yield child, k
+            if isinstance(v, (dict, list)):
+                yield from iter_keys(v, keys, child)
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            if isinstance(v, (dict, list)):
+                yield from iter_keys(v, keys, f"{path}.{i}" if path else str(i))
+
+def entry_command(jentry):
+    # the command of a COMMAND entry, None for the other entries
+    if jentry["c"] == "COMMAND" and "command" in jentry["attr"]:
+        return jentry["attr"]["command"]
+    return None
+
+def as_findings(result):
+    # rules return None, a Finding or an iterable of them, usually by yielding them
+    if result is None:
+        return ()
+    if isinstance(result, Finding):
+        return (result,)
+    return tuple(result)
+
+def collect(found, version, check, result):
+    for finding in as_findings(result):
+        if selected_severities is None or finding.severity in selected_severities:
+            finding.version = version
+            finding.rule = check.__name__
+            found.append(finding)
+
+def run_command_rules(version, jentry):
+    # the rules registered for the command of the entry and the rules of every command, they only depend on the command
+    found = []
+    command = entry_command(jentry)
+    if command is None:
+        return found
+    for check in command_rules.get(version, {}).get(command_name(command), ()):
+        collect(found, version, check, check(command, jentry))
+    for check in global_rules.get(version, ()):
+        collect(found, version, check, check(command, jentry))
+    return found
+
+def run_entry_rules(version, jentry, entry):
+    found = []
+    for check in entry_rules.get(version, ()):
+        collect(found, version, check, check(jentry, entry))
+    return found
+
+def run_rules(version, jentry, entry):
+    # an entry only goes through the rules registered for its command and the entry rules.
+    # Returns the findings of every rule of the version, an empty list when the entry passes all of them.
+    return run_command_rules(version, jentry) + run_entry_rules(version, jentry, entry)
+
+def registered_rules():
+    for by_name in command_rules.values():
+        for checks in by_name.values():
+            yield from checks
+    for checks in global_rules.values():
+        yield from checks
+    for checks in entry_rules.values():
+        yield from checks
+
+def wrap_rules(wrap):
+    # replaces every registered rule by wrap(version, rule), used to profile the rules
+    for version, by_name in command_rules.items():
+        for checks in by_name.values():
+            checks[:] = [wrap(version, check) for check in checks]
+    for version, checks in global_rules.items():
+        checks[:] = [wrap(version, check) for check in checks]
+    for version, checks in entry_rules.items():
+        checks[:] = [wrap(version, check) for check in checks]
+
+def rule_names():
+    return { inspect.unwrap(check).__name__ for check in registered_rules() }
+
+def select_rules(versions=None, names=None, selected=None):
+    # removes the rules of the other versions and the rules not in names from the registry, and keeps only the findings
+    # of the selected severities. None selects everything.
+    global selected_severities, selection
+
+    def keep(version, checks):
+        return [
+            check for check in checks
+            if (versions is None or version in versions) and (names is None or inspect.unwrap(check).__name__ in names)
+        ]
+    for version, by_name in command_rules.items():
+        for checks in by_name.values():
+            checks[:] = keep(version, checks)
+    for version, checks in global_rules.items():
+        checks[:] = keep(version, checks)
+    for version, checks in entry_rules.items():
+        checks[:] = keep(version, checks)
+    selected_severities = frozenset(selected) if selected is not None else None
+    selection = [sorted(values) if values is not None else None for values in (versions, names, selected)]
@@ -0,0 +1,104 @@
+import math
+import random
+from decoder import decode
+from engine import check
+from rules import command_name, entry_command
+from shapes import query_shape
+
+# Sampling checks part of the slow queries and estimates how many queries of the whole logs every finding
+# concerns, with a 95% confidence interval. Two modes:
+#   fraction  every line is checked with the given probability, the first line of every command name always is.
+#             Only the checked lines are decoded.
+#   reservoir a uniform sample of at most size lines is kept for every query shape and checked at the end. Every
+#             line is decoded to get its shape, the rules only run on the samples.
+
+z = 1.96
+command_marker = '"command":{"'
+
+def raw_command_name(entry):
+    # the first key of attr.command, read from the raw line. Quotes inside strings are escaped, so the marker
+    # can only be the command key itself.
+    if not isinstance(entry, str):
+        command = entry_command(entry.jentry)
+        return command_name(command) if command is not None else None
+    i = entry.find(command_marker)
+    if i == -1:
+        return None
+    i += len(command_marker)
+    return entry[i:entry.find('"', i)]
+
+def fraction_lines(entries, fraction, rng, counts):
+    seen = set()
+    for entry in entries:
+        counts["lines"] += 1
+        name = raw_command_name(entry)
+        if name in seen:
+            if rng.random() >= fraction:
+                continue
+            counts["sampled"] += 1
+            yield entry, False
+            continue
+
+        # the first line of a command name is not sampled, its findings are counted as forced
+        seen.add(name)
+        counts["sampled"] += 1
+        yield entry, True
+
+def fraction_estimate(count, forced, fraction):
+    # the sampled occurrences follow a binomial distribution, the forced ones are counted once
+    sampled = count - forced
+    estimate = forced + sampled / fraction
+    if sampled == 0:
+        # rule of three, nothing sampled beyond the forced lines
+        margin = 3 * (1 - fraction) / fraction
+    else:
+        margin = z * math.sqrt(sampled * (1 - fraction)) / fraction
+    return estimate, max(count, estimate - margin), estimate + margin
+
+def sample_fraction(entries, fraction, seed=0, cache=None, stats=None, writer=None):
+    rng = random.Random(seed)
+    counts = { "lines": 0, "sampled": 0 }
+    findings = check(fraction_lines(entries, fraction, rng, counts), cache, stats, writer, flagged=True)
+    for finding in findings.values():
+        # the occurrences of the forced lines are not sampled, they are left out of the estimates
+        set_estimate(finding, *fraction_estimate(finding["count"], finding.pop("forced", 0), fraction))
+    return findings, counts
+
+def reservoir_estimate(count, sampled, total):
+    # count occurrences in a sample of sampled lines out of total, drawn without replacement
+    p = min(count / sampled, 1.0)
+    estimate = p * total
+    margin = z * total * math.sqrt(p * (1 - p) / sampled * (total - sampled) / max(total - 1, 1))
+    return estimate, max(count, estimate - margin), min(total, estimate + margin)
+
+def sample_reservoir(entries, size, seed=0, cache=None, stats=None, writer=None):
+    rng = random.Random(seed)
+    # shape -> [lines seen, sample]
+    reservoirs = {}
+    counts = { "lines": 0, "sampled": 0 }
+    for entry in entries:
+        counts["lines"] += 1
+        shape = query_shape(decode(entry))
+        reservoir = reservoirs.get(shape)
+        if reservoir is None:
+            reservoir = reservoirs[shape] = [0, []]
+        reservoir[0] += 1
+        if len(reservoir[1]) < size:
+            reservoir[1].append(entry)
+        else:
+            i = rng.randrange(reservoir[0])
+            if i < size:
+                reservoir[1][i] = entry
+
+    samples = (entry for _, sample in reservoirs.values() for entry in sample)
+    findings = check(samples, cache, stats, writer)
+    for finding in findings.values():
+        total, sample = reservoirs[finding["shape"]]
+        set_estimate(finding, *reservoir_estimate(finding["count"], len(sample), total))
+    counts["sampled"] = sum(len(sample) for _, sample in reservoirs.values())
+    return findings, counts
+
+def set_estimate(finding, estimate, low, high):
+    finding["estimate"] = round(estimate)
+    finding["low"] = math.floor(low)
+    finding["high"] = math.ceil(high)
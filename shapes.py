@@ -0,0 +1,41 @@
+import json
+from rules import command_name, payload_parameters
+
+def normalize(value, positions=False):
+    # keeps the keys and operators of a value and replaces its literals, null is kept as the 8.0 rules depend on it.
+    # The shapes of the elements of a list are kept once each, unless positions is set and the list holds
+    # documents or lists: the rules report locations like updates.1.q that depend on their position.
+    if isinstance(value, dict):
+        return { k: normalize(v, positions) for k, v in value.items() }
+    if isinstance(value, list):
+        shapes = [normalize(v, positions) for v in value]
+        if positions and any(isinstance(v, (dict, list)) for v in value):
+            return shapes
+        unique = []
+        for shape in shapes:
+            if shape not in unique:
+                unique.append(shape)
+        return unique
+    if value is None:
+        return None
+    return "?"
+
+def shape_of(jentry, positions):
+    attr = jentry.get("attr") or {}
+    shape = { "c": jentry.get("c"), "ns": attr.get("ns") }
+    command = attr.get("command")
+    if isinstance(command, dict):
+        shape["command"] = command_name(command)
+        # only the name of the parameters holding user documents is part of the shape
+        shape["parameters"] = { k: "?" if k in payload_parameters else normalize(v, positions) for k, v in command.items() }
+    return json.dumps(shape, sort_keys=True, separators=(",", ":"))
+
+def query_shape(jentry):
+    # queries differing only by their literal values share a shape: component, namespace, command name,
+    # parameter names and the structure of the parameters
+    return shape_of(jentry, False)
+
+def verdict_shape(jentry):
+    # the shape the verdicts of the command rules are cached by: the query shape with the documents of a list kept
+    # at their position, so two commands sharing it get the same findings at the same locations
+    return shape_of(jentry, True)
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import mmap
+import os
+from findings import finding_key, merge_findings, utc_timestamp
+from reader import is_plain_log, open_log
+
+# The state file lets a scan resume where the previous one stopped. For every log file it records its
+# identity (device, inode, size and a hash of its first bytes) and the offset up to which it was processed,
+# together with the findings accumulated so far.
+state_version = 2
+head_size = 4096
+
+def new_state():
+    return { "version": state_version, "files": {}, "findings": [] }
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return new_state()
+    with open(state_path, 'r') as f:
+        state = json.load(f)
+    if state.get("version") != state_version:
+        raise Exception(f"{state_path} was written by an incompatible version, remove it to start a new scan")
+    return state
+
+def save_state(state_path, state):
+    # written next to the previous state and renamed, an interrupted run keeps the previous state
+    temp_path = state_path + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path)
+
+def state_findings(state):
+    # the timestamps of states written before they were stored in UTC are converted
+    findings = {}
+    for finding in state["findings"]:
+        finding["first"] = utc_timestamp(finding["first"])
+        finding["last"] = utc_timestamp(finding["last"])
+        findings[finding_key(finding)] = finding
+    return findings
+
+def head_hash(file_path, length=head_size):
+    # hashed after decompression, so a log that was rotated and then compressed keeps its identity
+    with open_log(file_path) as f:
+        head = f.read(length)
+    return hashlib.sha1(head).hexdigest(), len(head)
+
+def complete_length(file_path):
+    # offset just after the last newline, a line still being written is left for the next run
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.rfind(b"\n") + 1
+
+def find_record(file_path, stat, records):
+    # the same inode first, then the same content under another name: a rotated or compressed log
+    for record in records:
+        if (record["dev"], record["inode"]) == (stat.st_dev, stat.st_ino):
+            if head_hash(file_path, record["head_length"]) == (record["head"], record["head_length"]):
+                return record
+
+    heads = {}
+    for record in records:
+        length = record["head_length"]
+        if length not in heads:
+            heads[length] = head_hash(file_path, length)
+        if heads[length] == (record["head"], length):
+            return record
+    return None
+
+def plan_segments(file_paths, state):
+    # returns the segments (file_path, start, end) not processed yet and the file records of the next state
+    records = list(state["files"].values())
+    claimed = set()
+    segments = []
+    files = {}
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        compressed = not is_plain_log(file_path)
+        record = find_record(file_path, stat, records)
+        start = 0
+        if record is not None:
+            if id(record) in claimed:
+                # a copy of a log already processed in this run
+                continue
+            claimed.add(id(record))
+            if record["complete"]:
+                files[file_path] = dict(record, path=file_path, dev=stat.st_dev, inode=stat.st_ino)
+                continue
+            start = record["offset"]
+
+        end = None if compressed else complete_length(file_path)
+        if not compressed and end < start:
+            # the file was truncated, it is processed again
+            start = 0
+        head, head_length = head_hash(file_path)
+        files[file_path] = {
+            "path": file_path,
+            "dev": stat.st_dev,
+            "inode": stat.st_ino,
+            "size": stat.st_size,
+            "head": head,
+            "head_length": head_length,
+            "offset": end,
+            # compressed logs and profile dumps are archives, they are processed once to the end
+            "complete": compressed,
+        }
+        if end is None or start < end:
+            segments.append((file_path, start, end))
+
+    return segments, files
+
+def update_state(state, files, findings):
+    merged = merge_findings(state_findings(state), findings)
+    state["files"] = files
+    state["findings"] = list(merged.values())
+    return merged
@@ -0,0 +1,94 @@
+import functools
+import json
+import sys
+import time
+import rules
+
+# Counters of a scan, only collected with --stats or --stats-file. Without them no rule is wrapped and the
+# reader and the engine run their usual loops, so a scan does not pay for the instrumentation.
+#   lines["read"]     lines in the scanned files
+#   lines["excluded"] slow queries dropped by the application filter
+#   lines["decoded"]  lines decoded, the others are filtered out as bytes
+#   lines["checked"]  decoded lines holding a command, that went through the command rules
+#   seconds           time reading and filtering the lines (io), decoding them and running the rules
+#   rules[(version, rule)] -> [calls, hits, seconds]
+
+class Stats:
+    def __init__(self):
+        self.lines = { "read": 0, "excluded": 0, "decoded": 0, "checked": 0 }
+        self.seconds = { "io": 0.0, "decode": 0.0, "rules": 0.0 }
+        self.rules = {}
+
+    def rule_counter(self, version, name):
+        counter = self.rules.get((version, name))
+        if counter is None:
+            counter = self.rules[(version, name)] = [0, 0, 0.0]
+        return counter
+
+    def merge(self, other):
+        for name, count in other.lines.items():
+            self.lines[name] += count
+        for name, seconds in other.seconds.items():
+            self.seconds[name] += seconds
+        for (version, name), (calls, hits, seconds) in other.rules.items():
+            counter = self.rule_counter(version, name)
+            counter[0] += calls
+            counter[1] += hits
+            counter[2] += seconds
+        return self
+
+    def to_dict(self):
+        return {
+            "lines": dict(self.lines, filtered=self.lines["read"] - self.lines["decoded"]),
+            "seconds": dict(self.seconds),
+            "rules": [
+                { "version": version, "rule": name, "calls": calls, "hits": hits, "seconds": seconds }
+                for (version, name), (calls, hits, seconds) in sorted(self.rules.items())
+            ],
+        }
+
+# the stats the profiled rules count into, every scan task sets its own
+current = None
+profiling = False
+
+def profiled(version, check):
+    name = check.__name__
+
+    @functools.wraps(check)
+    def run(*args):
+        counter = current.rule_counter(version, name)
+        start = time.perf_counter()
+        # rules yielding their findings only run while they are consumed
+        found = rules.as_findings(check(*args))
+        counter[0] += 1
+        counter[1] += len(found)
+        counter[2] += time.perf_counter() - start
+        return found
+    return run
+
+def enable_profiling():
+    # wraps the registered rules once per process, forked workers inherit the wrapped ones
+    global profiling
+    if not profiling:
+        rules.wrap_rules(profiled)
+        profiling = True
+
+def start():
+    global current
+    enable_profiling()
+    current = Stats()
+    return current
+
+def print_stats(stats, out=sys.stdout):
+    lines = stats.lines
+    seconds = stats.seconds
+    print("Statistics", file=out)
+    print(f"   lines: {lines['read']} read, {lines['read'] - lines['decoded']} filtered ({lines['excluded']} by application), {lines['decoded']} decoded, {lines['checked']} checked", file=out)
+    print(f"   time: {seconds['io']:.3f}s io, {seconds['decode']:.3f}s decode, {seconds['rules']:.3f}s rules", file=out)
+    print(f"   {'version':<8}{'rule':<36}{'calls':>10}{'hits':>10}{'seconds':>10}", file=out)
+    for (version, name), (calls, hits, elapsed) in sorted(stats.rules.items()):
+        print(f"   {version:<8}{name:<36}{calls:>10}{hits:>10}{elapsed:>10.3f}", file=out)
+
+def save_stats(file_path, stats):
+    with open(file_path, 'w') as f:
+        json.dump(stats.to_dict(), f, indent=2)
@@ -0,0 +1,31 @@
+from applications import ApplicationFilter, default_filter, line_app_name
+
+# Applications are matched on attr.appName, with or without the version appended to it
+
+def test_internal_applications_are_excluded_with_their_version():
+    assert not default_filter.accepts("MongoDB Automation Agent v13.10.0 (git: 1234)")
+    assert not default_filter.accepts("OplogFetcher")
+    assert default_filter.accepts("billing")
+    assert default_filter.accepts(None)
+
+def test_configured_names_match_with_or_without_the_version():
+    include = ApplicationFilter(["billing v2", "orders"], [])
+    assert include.accepts("billing v2")
+    assert include.accepts("orders v1.4")
+    assert not include.accepts("billing v3")
+    assert not include.accepts("billing")
+    assert not include.accepts(None)
+
+    exclude = ApplicationFilter(None, ["etl v1", "reports"])
+    assert not exclude.accepts("etl v1")
+    assert not exclude.accepts("reports v2.0")
+    assert exclude.accepts("etl v2")
+    assert exclude.accepts("etl")
+
+def test_app_name_is_read_from_the_raw_line():
+    line = b'{"c":"COMMAND","attr":{"appName":"billing v2","command":{"find":"c","comment":"x"}}}'
+    assert line_app_name(line) == "billing v2"
+    # the appName of the command is not the one of the entry
+    line = b'{"c":"COMMAND","attr":{"command":{"find":"c","appName":"x"},"appName":"etl \\"v1\\""}}'
+    assert line_app_name(line) == 'etl "v1"'
+    assert line_app_name(b'{"c":"COMMAND","attr":{"command":{"find":"c"}}}') is None
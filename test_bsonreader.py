@@ -0,0 +1,111 @@
+import gzip
+import json
+import struct
+import pytest
+import bsonreader
+import decoder
+from engine import check
+from reader import iter_file_query_lines
+
+# BSON documents are built with struct, the reader must decode them to the extended JSON the 4.4 logs use
+
+def cstring(value):
+    return value.encode() + b"\x00"
+
+def bson_string(value):
+    data = value.encode() + b"\x00"
+    return struct.pack("<i", len(data)) + data
+
+def bson_document(elements):
+    # elements are (type, name, encoded value)
+    body = b"".join(bytes([kind]) + cstring(name) + value for kind, name, value in elements) + b"\x00"
+    return struct.pack("<i", len(body) + 4) + body
+
+def bson_array(elements):
+    return bson_document([(kind, str(i), value) for i, (kind, value) in enumerate(elements)])
+
+uuid_bytes = bytes(range(16))
+# 1.5 is the coefficient 15 with the exponent -1
+decimal_bytes = struct.pack("<QQ", 15, (6176 - 1) << 49)
+
+bson_values = [
+    (0x01, struct.pack("<d", 1.25), 1.25),
+    (0x02, bson_string("héllo"), "héllo"),
+    (0x03, bson_document([(0x10, "a", struct.pack("<i", 1))]), { "a": 1 }),
+    (0x04, bson_array([(0x10, struct.pack("<i", 1)), (0x0A, b"")]), [1, None]),
+    (0x05, struct.pack("<i", 16) + b"\x04" + uuid_bytes, { "$uuid": "00010203-0405-0607-0809-0a0b0c0d0e0f" }),
+    (0x05, struct.pack("<i", 3) + b"\x00abc", { "$binary": { "base64": "YWJj", "subType": "00" } }),
+    (0x07, bytes(range(12)), { "$oid": "000102030405060708090a0b" }),
+    (0x08, b"\x01", True),
+    (0x09, struct.pack("<q", 1704067200123), { "$date": "2024-01-01T00:00:00.123+00:00" }),
+    (0x0A, b"", None),
+    (0x0B, cstring("^a") + cstring("i"), { "$regularExpression": { "pattern": "^a", "options": "i" } }),
+    (0x10, struct.pack("<i", -7), -7),
+    (0x11, struct.pack("<II", 5, 1704067200), { "$timestamp": { "t": 1704067200, "i": 5 } }),
+    (0x12, struct.pack("<q", 2 ** 40), 2 ** 40),
+    (0x13, decimal_bytes, { "$numberDecimal": "1.5" }),
+    (0xFF, b"", { "$minKey": 1 }),
+    (0x7F, b"", { "$maxKey": 1 }),
+]
+
+def test_bson_values_round_trip():
+    data = bson_document([(kind, f"f{i}", value) for i, (kind, value, _) in enumerate(bson_values)])
+    document, end = bsonreader.decode_document(data, 0)
+    assert end == len(data)
+    assert document == { f"f{i}": expected for i, (_, _, expected) in enumerate(bson_values) }
+
+def profile_document(i):
+    command = bson_document([
+        (0x02, "find", bson_string("orders")),
+        (0x03, "filter", bson_document([(0x0A, "status", b"")])),
+        (0x02, "$db", bson_string("shop")),
+    ])
+    return bson_document([
+        (0x02, "op", bson_string("query")),
+        (0x02, "ns", bson_string("shop.orders")),
+        (0x03, "command", command),
+        (0x10, "millis", struct.pack("<i", 150)),
+        (0x09, "ts", struct.pack("<q", 1704067200000 + i)),
+        (0x02, "appName", bson_string("app")),
+    ])
+
+@pytest.mark.parametrize("name", ["system.profile.bson", "system.profile.bson.gz"])
+def test_profile_dump_entries(tmp_path, name):
+    dump = tmp_path / name
+    data = b"".join(profile_document(i) for i in range(3))
+    if name.endswith(".gz"):
+        with gzip.open(dump, 'wb') as f:
+            f.write(data)
+    else:
+        dump.write_bytes(data)
+    entries = list(iter_file_query_lines(str(dump)))
+    assert len(entries) == 3
+    jentry = decoder.decode(entries[0])
+    assert jentry["attr"]["command"] == { "find": "orders", "filter": { "status": None }, "$db": "shop" }
+    assert jentry["attr"]["durationMillis"] == 150
+    assert json.loads(str(entries[0])) == jentry
+    findings = check(entries)
+    assert [(finding["rule"], finding["count"]) for finding in findings.values()] == [("check_find_parameters", 3)]
+
+@pytest.mark.parametrize("name", ["system.profile.bson", "system.profile.bson.gz"])
+def test_profile_dump_invalid_length(tmp_path, name):
+    dump = tmp_path / name
+    data = struct.pack("<i", 3) + b"\x00" * 64
+    if name.endswith(".gz"):
+        with gzip.open(dump, 'wb') as f:
+            f.write(data)
+    else:
+        dump.write_bytes(data)
+    with pytest.raises(Exception, match="length|invalid"):
+        list(iter_file_query_lines(str(dump)))
+
+def test_profile_entries_are_searched_without_being_serialized():
+    document = bsonreader.decode_document(profile_document(0), 0)[0]
+    document["command"]["comment"] = "legacy OP_QUERY client"
+    entry = bsonreader.ProfileEntry(bsonreader.profile_entry(document))
+    findings = check([entry])
+    assert entry.line is None
+    assert ("check_op_codes_removed", "OP_QUERY is not supported in version 5.1+") in [(finding["rule"], finding["message"]) for finding in findings.values()]
+    for text in ["OP_QUERY", "OP_INSERT", "comment", "shop.orders", "orders", "1704067200", "status"]:
+        assert (text in entry) == (text in json.dumps(entry.jentry, separators=(",", ":")))
+    assert entry.line is None
@@ -0,0 +1,42 @@
+import json
+import loggen
+from cache import VerdictCache
+from engine import check
+
+# The verdicts reused from the cache must give the findings the rules give
+
+def slow_query(command):
+    return json.dumps({ "t": { "$date": "2024-01-01T00:00:00.000+00:00" }, "c": "COMMAND", "msg": "Slow query", "attr": { "ns": "shop.orders", "command": command, "durationMillis": 150 } })
+
+def counts(findings):
+    return { key: finding["count"] for key, finding in findings.items() }
+
+def check_cached(entries, cache_path):
+    cache = VerdictCache(str(cache_path))
+    try:
+        return check(entries, cache)
+    finally:
+        cache.close()
+
+def test_statements_are_not_merged_by_the_cache(tmp_path):
+    null_statement = { "q": { "x": None }, "u": { "$set": { "y": 1 } } }
+    entries = [
+        slow_query({ "update": "orders", "updates": [null_statement, null_statement] }),
+        slow_query({ "update": "orders", "updates": [null_statement] }),
+        slow_query({ "aggregate": "orders", "pipeline": [{ "$match": { "a": 1 } }, { "$match": { "x": None } }], "cursor": {} }),
+        slow_query({ "aggregate": "orders", "pipeline": [{ "$match": { "a": 2 } }], "cursor": {} }),
+        slow_query({ "find": "orders", "filter": { "x": { "$in": [1, 2, None] } } }),
+        slow_query({ "find": "orders", "filter": { "x": { "$in": [3, None] } } }),
+    ]
+    expected = check(entries)
+    locations = sorted((finding["location"], finding["count"]) for finding in expected.values() if finding["rule"] == "check_write_parameters")
+    assert locations == [("updates.0.q", 2), ("updates.1.q", 1)]
+    # verdicts computed in this run, then read back from the file
+    assert counts(check_cached(entries, tmp_path / "verdicts.db")) == counts(expected)
+    assert counts(check_cached(entries, tmp_path / "verdicts.db")) == counts(expected)
+
+def test_cached_scans_match_uncached_scans(tmp_path):
+    entries = [line for line in loggen.generate(3000, 4, slow_ratio=0.5, internal_ratio=0) if '"Slow query"' in line]
+    expected = check(entries)
+    assert counts(check_cached(entries, tmp_path / "verdicts.db")) == counts(expected)
+    assert counts(check_cached(entries, tmp_path / "verdicts.db")) == counts(expected)
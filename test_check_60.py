@@ -0,0 +1,29 @@
+import json
+import check_60
+from decoder import decode
+
+# The 6.0 operator checks compare the keys of the queries of a command, never the values they hold
+
+def findings(command):
+    line = json.dumps({ "c": "COMMAND", "msg": "Slow query", "attr": { "ns": "shop.orders", "command": command } })
+    return [(finding.message.split(" ")[0], finding.location) for finding in check_60.check_entry(decode(line), line)]
+
+def test_max_does_not_match_max_time_ms():
+    assert findings({ "find": "orders", "filter": { "a": 1 }, "maxTimeMS": 100, "max": { "a": 5 } }) == []
+    assert findings({ "find": "orders", "filter": { "$maxTimeMS": 100 } }) == [("$maxTimeMS", "filter.$maxTimeMS")]
+    assert findings({ "find": "orders", "filter": { "$query": { "a": 1 }, "$max": { "a": 5 } } }) == [("$query", "filter.$query"), ("$max", "filter.$max")]
+
+def test_strings_holding_operator_names_are_ignored():
+    assert findings({ "find": "orders", "filter": { "name": "$max", "note": { "$eq": "$mod" }, "tags": ["$comment", "$hint"] }, "comment": "$query" }) == []
+    assert findings({ "aggregate": "orders", "pipeline": [{ "$match": { "a": "$mod" } }, { "$project": { "m": "$max" } }], "cursor": {} }) == []
+
+def test_only_the_queries_of_a_command_are_walked():
+    assert findings({ "aggregate": "orders", "pipeline": [{ "$match": { "a": { "$mod": [2, 0] } } }], "cursor": {} }) == [("$mod", "pipeline.0.$match.a.$mod")]
+    updates = [{ "q": { "a": 1 }, "u": { "$set": { "b": { "$mod": 1 } } } }, { "q": { "a": { "$mod": [2, 0] } }, "u": { "b": 1 } }]
+    assert findings({ "update": "orders", "updates": updates, "lsid": { "$mod": 1 } }) == [("$mod", "updates.1.q.a.$mod")]
+    # the query operators are unsupported with find only
+    assert findings({ "aggregate": "orders", "pipeline": [{ "$match": { "$comment": "x" } }], "cursor": {} }) == []
+
+def test_every_operator_is_reported_once():
+    query = { "$or": [{ "a": { "$mod": [2, 0] } }, { "b": { "$mod": [3, 0] } }], "$comment": "x" }
+    assert findings({ "find": "orders", "filter": query }) == [("$mod", "filter.$or.0.a.$mod"), ("$comment", "filter.$comment")]
@@ -0,0 +1,50 @@
+import json
+import pytest
+import check_80
+from decoder import decode
+
+# The 8.0 null check reports the equality predicates comparing a field to null or undefined, and nothing else
+
+def locations(command):
+    line = json.dumps({ "c": "COMMAND", "msg": "Slow query", "attr": { "ns": "shop.orders", "command": command } })
+    return [finding.location for finding in check_80.check_entry(decode(line), line)]
+
+@pytest.mark.parametrize("filter", [
+    { "status": None },
+    { "status": { "$undefined": True } },
+    { "status": { "$eq": None } },
+    { "status": { "$ne": None } },
+    { "status": { "$in": ["a", None] } },
+    { "status": { "$nin": [{ "$undefined": True }] } },
+    { "status": { "$not": { "$eq": None } } },
+    { "$and": [{ "a": 1 }, { "$or": [{ "b": 2 }, { "status": None }] }] },
+    { "tags": { "$elemMatch": { "status": None } } },
+    { "tags": { "$elemMatch": { "$eq": None } } },
+])
+def test_null_equalities_are_reported(filter):
+    assert locations({ "find": "orders", "filter": filter }) == ["filter"]
+
+@pytest.mark.parametrize("filter", [
+    # field names and strings mentioning null
+    { "nullable": True, "note": "null" },
+    { "status": "null" },
+    { "status": { "$exists": False } },
+    { "status": { "$gt": None } },
+    { "status": { "$in": ["a", "b"] } },
+    # a document compared as a whole, not an operator document
+    { "address": { "city": None } },
+    # aggregation expressions are not equality match expressions
+    { "$expr": { "$eq": ["$status", None] } },
+    { "$and": [{ "$expr": { "$eq": ["$status", None] } }] },
+    {},
+])
+def test_other_predicates_are_not_reported(filter):
+    assert locations({ "find": "orders", "filter": filter }) == []
+
+def test_match_stages_and_write_statements_are_reported_at_their_location():
+    pipeline = [{ "$match": { "a": 1 } }, { "$project": { "status": None } }, { "$match": { "status": { "$eq": None } } }]
+    assert locations({ "aggregate": "orders", "pipeline": pipeline, "cursor": {} }) == ["pipeline.2.$match"]
+    updates = [{ "q": { "a": 1 }, "u": { "$set": { "status": None } } }, { "q": { "status": None }, "u": { "$set": { "a": 1 } } }]
+    assert locations({ "update": "orders", "updates": updates }) == ["updates.1.q"]
+    deletes = [{ "q": { "status": { "$in": [None] } }, "limit": 0 }, { "q": { "status": "x" }, "limit": 1 }]
+    assert locations({ "delete": "orders", "deletes": deletes }) == ["deletes.0.q"]
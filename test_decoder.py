@@ -0,0 +1,52 @@
+import json
+import pytest
+import decoder
+
+# Long insert lines are decoded without their documents, every other line must decode as a whole
+
+def insert_line(documents, **command):
+    command = dict({ "insert": "orders", "documents": documents }, **command)
+    entry = { "t": { "$date": "2024-01-01T00:00:00.000+00:00" }, "c": "COMMAND", "msg": "Slow query", "attr": { "ns": "shop.orders", "command": command, "durationMillis": 1 } }
+    return json.dumps(entry, separators=(",", ":"))
+
+@pytest.mark.parametrize("value", ["x", 'a \\" quote', "back\\\\slash", "é", None, 1.5])
+def test_lazy_decoding_cuts_dense_documents(value):
+    line = insert_line([{ "_id": i, "v": value, "a": [i, { "b": {} }] } for i in range(5000)], lsid={ "id": [1] })
+    jentry = json.loads(json.dumps(decoder.decode(line)))
+    assert "$skipped" in jentry["attr"]["command"]["documents"]
+    expected = json.loads(line)
+    expected["attr"]["command"]["documents"] = jentry["attr"]["command"]["documents"]
+    assert jentry == expected
+
+@pytest.mark.parametrize("line", [
+    # a string holding a bracket
+    insert_line([{ "_id": i, "v": "]" } for i in range(5000)]),
+    # long strings are parsed faster than scanned
+    insert_line([{ "v": "x" * 100000 }]),
+    # a documents key that is not a parameter of the command
+    json.dumps({ "c": "COMMAND", "attr": { "command": { "find": "c", "filter": { "documents": [{ "a": i } for i in range(20000)] } } } }, separators=(",", ":")),
+    # a line logging a skipped marker of its own
+    insert_line([{ "a": i } for i in range(20000)], comment={ "$skipped": 1 }),
+])
+def test_lazy_decoding_falls_back_to_a_whole_decode(line):
+    assert json.loads(json.dumps(decoder.decode(line))) == json.loads(line)
+
+@pytest.mark.parametrize("backend", decoder.available_backends())
+def test_decoded_entries_are_read_only(backend):
+    decoder.use_backend(backend)
+    try:
+        jentry = decoder.decode('{"c":"COMMAND","attr":{"command":{"find":"c","filter":{"a":{"$in":[1,{"b":[2]}]}}}}}')
+    finally:
+        decoder.use_backend()
+    values = jentry["attr"]["command"]["filter"]["a"]["$in"]
+    for mutate in [
+        lambda: jentry.pop("c"),
+        lambda: jentry["attr"]["command"]["filter"].update(x=1),
+        lambda: values.append(3),
+        lambda: values.__setitem__(0, 2),
+        lambda: values[1]["b"].sort(),
+        lambda: values[1].setdefault("c", 1),
+    ]:
+        with pytest.raises(TypeError):
+            mutate()
+    assert json.loads(json.dumps(jentry)) == { "c": "COMMAND", "attr": { "command": { "find": "c", "filter": { "a": { "$in": [1, { "b": [2] }] } } } } }
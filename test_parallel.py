@@ -0,0 +1,28 @@
+import loggen
+import pytest
+from parallel import plan_tasks
+from reader import iter_mapped_query_lines
+
+# Byte ranges planned for the workers must read every slow query line of a log exactly once
+
+def write_lines(file_path, lines, mode='w'):
+    with open(file_path, mode) as f:
+        f.writelines(lines)
+
+def generated_lines(lines, seed):
+    # no internal application, every slow query is checked
+    return list(loggen.generate(lines, seed, slow_ratio=0.5, internal_ratio=0))
+
+@pytest.mark.parametrize("chunk_size", [1, 97, 4096, 65536, 10 ** 9])
+def test_ranges_read_every_line_once(tmp_path, chunk_size):
+    log = tmp_path / "mongod.log"
+    lines = generated_lines(500, 1)
+    # the last line has no newline
+    lines[-1] = lines[-1].rstrip("\n")
+    write_lines(log, lines)
+    whole = list(iter_mapped_query_lines(str(log)))
+    ranges = []
+    for file_path, start, end, _, _ in plan_tasks([(str(log), 0, None)], chunk_size):
+        ranges.extend(iter_mapped_query_lines(file_path, start, end))
+    assert ranges == whole
+    assert len(whole) == sum(1 for line in lines if '"Slow query"' in line)
@@ -0,0 +1,58 @@
+import itertools
+import json
+import loggen
+from engine import check
+from partials import load_partial, merge_partials, new_partial, save_partial
+from sampling import sample_fraction
+
+# Merging partial reports must give the same report whatever the order and the grouping of the partials
+
+def slow_queries(lines, seed):
+    return [line for line in loggen.generate(lines, seed, slow_ratio=0.5, internal_ratio=0) if '"Slow query"' in line]
+
+def host_partials():
+    partials = [new_partial(check(slow_queries(1500, seed)), f"host{seed}") for seed in range(3)]
+    # a sampled host, with estimates
+    findings, _ = sample_fraction(slow_queries(1500, 3), 0.5, 3)
+    partials.append(new_partial(findings, "host3"))
+    # a host whose findings have no timestamp, sharing keys with the other hosts
+    findings = check(slow_queries(400, 4))
+    for finding in findings.values():
+        finding["first"] = finding["last"] = None
+    partials.append(new_partial(findings, "host4"))
+    return partials
+
+def merged(partials):
+    # written and read back as a partial file would be
+    return json.loads(json.dumps(merge_partials(partials)))
+
+def test_merge_is_associative_and_commutative(tmp_path):
+    partials = host_partials()
+    expected = merged(partials)
+    for order in itertools.permutations(partials):
+        assert merged(order) == expected
+    a, b, c, d, e = partials
+    for groups in [
+        [merge_partials([a, b]), merge_partials([c, d, e])],
+        [a, merge_partials([b, merge_partials([c, merge_partials([d, e])])])],
+        [merge_partials([e, c]), b, merge_partials([d, a])],
+        [merge_partials([merge_partials([a, d]), e]), merge_partials([c, b])],
+    ]:
+        assert merged(groups) == expected
+        assert merged(reversed(groups)) == expected
+    # partials merged by a previous run and read back from a file
+    save_partial(str(tmp_path / "ab.json.gz"), merge_partials([a, b]))
+    save_partial(str(tmp_path / "cde.json"), merge_partials([c, d, e]))
+    assert merged([load_partial(str(tmp_path / "cde.json")), load_partial(str(tmp_path / "ab.json.gz"))]) == expected
+
+def test_merge_adds_counts_and_keeps_the_earliest_samples():
+    partials = host_partials()
+    report = merge_partials(partials)
+    assert report["hosts"] == [f"host{i}" for i in range(5)]
+    total = sum(finding["count"] for partial in partials for finding in partial["findings"])
+    assert sum(finding["count"] for finding in report["findings"]) == total
+    for finding in report["findings"]:
+        assert len(finding["samples"]) <= 5
+        assert finding["samples"] == sorted(finding["samples"], key=lambda sample: (sample["t"] is None, sample["t"] or "", sample["host"], sample["message"]))
+        if "estimate" in finding:
+            assert finding["low"] <= finding["estimate"] <= finding["high"]
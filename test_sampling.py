@@ -0,0 +1,30 @@
+import pytest
+import loggen
+from engine import check
+from sampling import sample_fraction
+from stats import Stats
+
+# The first line of every command name is always checked, its findings are counted once and not extrapolated
+
+def slow_queries(lines, seed):
+    return [line for line in loggen.generate(lines, seed, slow_ratio=0.5, internal_ratio=0) if '"Slow query"' in line]
+
+@pytest.mark.parametrize("stats", [None, Stats()])
+def test_only_forced_lines_are_checked_with_a_tiny_fraction(stats):
+    entries = slow_queries(2000, 5)
+    findings, counts = sample_fraction(entries, 1e-9, 0, stats=stats)
+    assert counts["lines"] == len(entries)
+    assert findings
+    for finding in findings.values():
+        assert finding["estimate"] == finding["count"]
+        assert "forced" not in finding
+
+@pytest.mark.parametrize("stats", [None, Stats()])
+def test_every_line_is_checked_with_the_whole_fraction(stats):
+    entries = slow_queries(2000, 6)
+    expected = check(entries)
+    findings, counts = sample_fraction(entries, 1.0, 0, stats=stats)
+    assert counts == { "lines": len(entries), "sampled": len(entries) }
+    assert { key: finding["count"] for key, finding in findings.items() } == { key: finding["count"] for key, finding in expected.items() }
+    for finding in findings.values():
+        assert finding["estimate"] == finding["low"] == finding["high"] == finding["count"]
@@ -0,0 +1,52 @@
+import gzip
+import os
+import loggen
+from engine import check
+from reader import iter_segments_query_lines
+from state import new_state, plan_segments, update_state
+
+# Incremental scans over several runs must find what a single scan of every line finds
+
+def write_lines(file_path, lines, mode='w'):
+    with open(file_path, mode) as f:
+        f.writelines(lines)
+
+def generated_lines(lines, seed):
+    # no internal application, every slow query is checked
+    return list(loggen.generate(lines, seed, slow_ratio=0.5, internal_ratio=0))
+
+def counts(findings):
+    return { key: finding["count"] for key, finding in findings.items() }
+
+def scan_incrementally(log_dir, state):
+    file_paths = sorted(os.path.join(log_dir, name) for name in os.listdir(log_dir))
+    segments, files = plan_segments(file_paths, state)
+    return update_state(state, files, check(iter_segments_query_lines(segments)))
+
+def test_incremental_scans_follow_growth_rotation_gzip_and_truncation(tmp_path):
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    log = log_dir / "mongod.log"
+    lines = generated_lines(1200, 2)
+    state = new_state()
+
+    # a line still being written is left for the next run
+    write_lines(log, lines[:300] + [lines[300][:40]])
+    scan_incrementally(log_dir, state)
+    write_lines(log, [lines[300][40:]] + lines[301:500], 'a')
+    scan_incrementally(log_dir, state)
+
+    # lines appended before the log is rotated and compressed are read from the compressed file
+    write_lines(log, lines[500:600], 'a')
+    with open(log, 'rb') as f, gzip.open(log_dir / "mongod.log.1.gz", 'wb') as rotated:
+        rotated.write(f.read())
+    os.remove(log)
+    write_lines(log, lines[600:900])
+    scan_incrementally(log_dir, state)
+
+    # a log truncated in place is read again from its start, the lines it starts with are counted again
+    write_lines(log, lines[600:620] + lines[900:1000])
+    findings = scan_incrementally(log_dir, state)
+
+    expected = check(line for line in lines[:1000] + lines[600:620] if '"Slow query"' in line)
+    assert counts(findings) == counts(expected)
@@ -0,0 +1,36 @@
+import datetime
+import random
+import loggen
+from reader import iter_mapped_query_lines, line_timestamp
+from timewindow import window_segment
+
+# The binary search for a time window must select the lines a linear scan selects
+
+def write_lines(file_path, lines, mode='w'):
+    with open(file_path, mode) as f:
+        f.writelines(lines)
+
+def generated_lines(lines, seed):
+    # no internal application, every slow query is checked
+    return list(loggen.generate(lines, seed, slow_ratio=0.5, internal_ratio=0))
+
+def test_window_segment_matches_a_linear_scan(tmp_path):
+    log = tmp_path / "mongod.log"
+    rng = random.Random(3)
+    lines = generated_lines(800, 3)
+    # lines without a timestamp in between
+    for i in sorted(rng.sample(range(len(lines)), 20), reverse=True):
+        lines.insert(i, "not a log line\n")
+    write_lines(log, lines)
+    first = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    for _ in range(20):
+        since = first + datetime.timedelta(milliseconds=rng.randrange(-1000, 9000))
+        until = since + datetime.timedelta(milliseconds=rng.randrange(0, 5000))
+        segment = window_segment(str(log), 0, None, since, until)
+        found = list(iter_mapped_query_lines(*segment)) if segment is not None else []
+        expected = []
+        for line in lines:
+            timestamp = line_timestamp(line.encode())
+            if '"Slow query"' in line and timestamp is not None and since <= timestamp <= until:
+                expected.append(line)
+        assert found == expected
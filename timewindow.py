@@ -0,0 +1,115 @@
+import argparse
+import datetime
+import os
+import re
+from bsonreader import is_profile_dump
+from reader import is_plain_log, line_timestamp, open_log
+
+# A scan limited to a time window only reads the part of every log file written within it. Log files are
+# time-ordered, so the first line of the window is found by a binary search on the byte offsets of uncompressed
+# files, and reading stops at the first line after the window.
+
+relative_time = re.compile(r"(\d+)([dhm])")
+units = { "d": "days", "h": "hours", "m": "minutes" }
+tail_size = 64 * 1024
+
+def parse_time(value):
+    # an ISO 8601 date or time, UTC when it has no offset, or a time relative to now like 7d, 12h or 30m
+    match = relative_time.fullmatch(value)
+    if match:
+        delta = datetime.timedelta(**{ units[match.group(2)]: int(match.group(1)) })
+        return datetime.datetime.now(datetime.timezone.utc) - delta
+    try:
+        timestamp = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a date like 2024-01-31 or 2024-01-31T12:00:00+00:00, or a time relative to now like 7d, 12h or 30m")
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp
+
+def first_timestamp(f, offset, end):
+    # the start and timestamp of the first line with a timestamp starting at or after offset, (end, None) when there is none
+    if offset > 0:
+        f.seek(offset - 1)
+        f.readline()
+    else:
+        f.seek(0)
+    position = f.tell()
+    while position < end:
+        line = f.readline()
+        if not line:
+            break
+        timestamp = line_timestamp(line)
+        if timestamp is not None:
+            return position, timestamp
+        position += len(line)
+    return end, None
+
+def last_timestamp(f, size):
+    # the timestamp of the last line that has one, read from the end of the file
+    start = max(size - tail_size, 0)
+    f.seek(start)
+    lines = f.read(size - start).split(b"\n")
+    if start > 0:
+        # the first piece is the end of a line starting before
+        lines = lines[1:]
+    for line in reversed(lines):
+        timestamp = line_timestamp(line)
+        if timestamp is not None:
+            return timestamp
+    return None
+
+def seek_time(f, start, end, after):
+    # the start of the first line within [start, end) for which after(timestamp) is true, end when there is none
+    low = start
+    high = end
+    while low < high:
+        middle = (low + high) // 2
+        _, timestamp = first_timestamp(f, middle, end)
+        if timestamp is None or after(timestamp):
+            high = middle
+        else:
+            low = middle + 1
+    return first_timestamp(f, low, end)[0]
+
+def window_segment(file_path, start, end, since, until):
+    # the part of the segment within the window, None when there is none
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if end is None else min(end, size)
+        _, first = first_timestamp(f, 0, size)
+        last = last_timestamp(f, size)
+        if first is None or (until is not None and first > until) or (since is not None and last is not None and last < since):
+            return None
+        if since is not None:
+            start = max(start, seek_time(f, start, end, lambda timestamp: timestamp >= since))
+        if until is not None:
+            end = seek_time(f, start, end, lambda timestamp: timestamp > until)
+    if start >= end:
+        return None
+    return (file_path, start, end)
+
+def starts_after(file_path, until):
+    with open_log(file_path) as f:
+        for line in f:
+            timestamp = line_timestamp(line)
+            if timestamp is not None:
+                return timestamp > until
+    return False
+
+def window_segments(segments, since=None, until=None):
+    # cuts the segments to the window, compressed files are only skipped when they start after it
+    # and profile dumps are compared to it while they are read
+    for file_path, start, end in segments:
+        if is_profile_dump(file_path):
+            yield (file_path, start, end)
+            continue
+        if is_plain_log(file_path):
+            segment = window_segment(file_path, start, end, since, until)
+            if segment is not None:
+                yield segment
+            continue
+
+        if until is not None and starts_after(file_path, until):
+            continue
+        yield (file_path, start, end)